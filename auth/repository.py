@@ -0,0 +1,25 @@
+"""
+Hot user lookups. Statements are built once at import with bound parameters, so a call
+only binds values: no per-call query construction or cache-key generation, and the
+compiled SQL comes straight from the engine's statement cache.
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+USER_BY_ID = select(models.User).where(models.User.id == bindparam("user_id")).limit(1)
+USER_BY_EMAIL = select(models.User).where(models.User.email == bindparam("email")).limit(1)
+USER_BY_PHONE = select(models.User).where(models.User.phone == bindparam("phone")).limit(1)
+
+
+def get_user_by_id(db: Session, user_id: int) -> models.User | None:
+    return db.execute(USER_BY_ID, {"user_id": user_id}).scalars().first()
+
+
+def get_user_by_email(db: Session, email: str) -> models.User | None:
+    return db.execute(USER_BY_EMAIL, {"email": email}).scalars().first()
+
+
+async def get_user_by_phone(db: AsyncSession, phone: str) -> models.User | None:
+    return (await db.execute(USER_BY_PHONE, {"phone": phone})).scalars().first()
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, status, Depends, HTTPException, BackgroundTasks
 from markdown_it.rules_block import reference
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 
-from . import schemas, models, utils
-from core.app.database import get_db
-from sqlalchemy.orm import Session
+from . import schemas, models, utils, repository
+from core.app.database import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from core.config.mails import send_welcome_mail, send_forgot_password_mail, send_signup_otp_mail
 import secrets
 from datetime import datetime, timezone, timedelta
@@ -25,31 +25,32 @@ def health():
 async def registerotp(
     user: schemas.UserCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Check if user already exists
     db_user = (
-        db.query(models.User)
-        .filter(
-            or_(
-                models.User.email == user.email,
-                models.User.phone == user.phone_number
+        await db.execute(
+            select(models.User).where(
+                or_(
+                    models.User.email == user.email,
+                    models.User.phone == user.phone_number
+                )
             )
         )
-        .first()
-    )
+    ).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="User already registered")
 
     otp_code = utils.generate_otp_v2()
-    expire_time = datetime.now(timezone.utc) + timedelta(seconds=40)
+    expire_time = utils.otp_expires_at()
 
     # Check if OTP already exists for this phone number
     otp_record = (
-        db.query(models.OTPRequest)
-        .filter(models.OTPRequest.data["phone_number"].as_string() == user.phone_number)
-        .first()
-    )
+        await db.execute(
+            select(models.OTPRequest)
+            .where(models.OTPRequest.data["phone_number"].as_string() == user.phone_number)
+        )
+    ).scalars().first()
 
     if otp_record:
         # Resend OTP → update only OTP-related fields
@@ -71,8 +72,8 @@ async def registerotp(
         )
         db.add(otp_record)
 
-    db.commit()
-    db.refresh(otp_record)
+    await db.commit()
+    await db.refresh(otp_record)
 
     # Send OTP email in background
     background_tasks.add_task(
@@ -91,18 +92,19 @@ async def registerotp(
 async def resend_otp(
     id: int,    
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-  db_otp = db.query(models.OTPRequest).filter(models.OTPRequest.id == id).first()
+  db_otp = await db.get(models.OTPRequest, id)
   if not db_otp:
     raise HTTPException(status_code=400, detail="NO RECORD FOR THIS USER")
   
   otp_code = utils.generate_otp_v2()
-  expire_time = datetime.now(timezone.utc) + timedelta(seconds=40)
+  expire_time = utils.otp_expires_at()
   
   db_otp.code = otp_code
   db_otp.expires_at = expire_time
-  db.commit()
+  await db.commit()
+  await db.refresh(db_otp)
 
   background_tasks.add_task(
     send_signup_otp_mail,
@@ -116,9 +118,9 @@ async def resend_otp(
     
   }
 @router.post("/register/verify-otp")
-async def register_user(data: schemas.RegisterVerifyOTP, db: Session = Depends(get_db)):
+async def register_user(data: schemas.RegisterVerifyOTP, db: AsyncSession = Depends(get_async_db)):
   # Find OTP
-  otp_record = db.query(models.OTPRequest).filter(models.OTPRequest.code == data.code, models.OTPRequest.id == data.id, models.OTPRequest.data["phone_number"].as_string() == data.phone_number).first()
+  otp_record = (await db.execute(select(models.OTPRequest).where(models.OTPRequest.code == data.code, models.OTPRequest.id == data.id, models.OTPRequest.data["phone_number"].as_string() == data.phone_number))).scalars().first()
   if not otp_record:
     raise HTTPException(status_code=400, detail="Invalid OTP")
 
@@ -146,7 +148,7 @@ async def register_user(data: schemas.RegisterVerifyOTP, db: Session = Depends(g
   phone_number = user_data.get("phone_number")
 
   # Check if user already exists
-  if db.query(models.User).filter(models.User.phone == phone_number).first():
+  if (await db.execute(select(models.User).where(models.User.phone == phone_number))).scalars().first():
     raise HTTPException(status_code=400, detail="User already registered")
 
   
@@ -166,8 +168,8 @@ async def register_user(data: schemas.RegisterVerifyOTP, db: Session = Depends(g
     password_hash = utils.get_password_hash(user_data["password"])
     new_user.password_hash = password_hash
   db.add(new_user)
-  db.commit()
-  db.refresh(new_user)
+  await db.commit()
+  await db.refresh(new_user)
 
   profile = models.PassengerProfile(
     user_id=new_user.id,
@@ -177,10 +179,10 @@ async def register_user(data: schemas.RegisterVerifyOTP, db: Session = Depends(g
     country=user_data.get("country")
   )
   db.add(profile)
-  db.commit()
+  await db.commit()
 
-  db.delete(otp_record)  # remove OTP after verification
-  db.commit()
+  await db.delete(otp_record)  # remove OTP after verification
+  await db.commit()
 
   access_token = utils.create_access_token({"user_id": new_user.id})
 
@@ -193,10 +195,10 @@ async def register_user(data: schemas.RegisterVerifyOTP, db: Session = Depends(g
 async def login_request_otp(
     user: schemas.UserLogin,
     background_task: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     print("serere",user.phone_number)
-    db_user = db.query(models.User).filter(models.User.phone == user.phone_number).first()
+    db_user = await repository.get_user_by_phone(db, user.phone_number)
     print(db_user)
     if not db_user:
         raise HTTPException(
@@ -206,7 +208,7 @@ async def login_request_otp(
 
     # Generate OTP
     otp_code = utils.generate_otp_v2()
-    expire_time = datetime.now(timezone.utc) + timedelta(seconds=40)
+    expire_time = utils.otp_expires_at()
 
     new_otp = models.OTPRequest(
         code=otp_code,
@@ -215,8 +217,8 @@ async def login_request_otp(
     )
 
     db.add(new_otp)
-    db.commit()
-    db.refresh(new_otp)
+    await db.commit()
+    await db.refresh(new_otp)
 
     # Send OTP via email/SMS (background task)
     background_task.add_task(
@@ -233,11 +235,11 @@ async def login_request_otp(
 @router.post("/login/verify-otp")
 async def login_verify_otp(
     data: schemas.LoginVerifyOTP,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    otp_record = db.query(models.OTPRequest).filter(
+    otp_record = (await db.execute(select(models.OTPRequest).where(
         models.OTPRequest.code == data.code
-    ).first()
+    ))).scalars().first()
     if not otp_record:
         raise HTTPException(status_code=400, detail="Invalid OTP")
     PKT = timezone(timedelta(hours=5))  # Pakistan timezone
@@ -255,13 +257,13 @@ async def login_verify_otp(
     phone = otp_record.data.get("phone_number")  # <- get phone from JSON stored in OTP
 
     # OTP is valid, proceed to login / generate token
-    db_user = db.query(models.User).filter(models.User.phone == phone).first()
+    db_user = (await db.execute(select(models.User).where(models.User.phone == phone))).scalars().first()
 
     access_token = utils.create_access_token({"user_id": db_user.id})
 
     # Delete used OTP
-    db.delete(otp_record)
-    db.commit()
+    await db.delete(otp_record)
+    await db.commit()
 
     return {"access_token": access_token, "user": schemas.UserResponse.model_validate(db_user)}
 
@@ -269,10 +271,10 @@ async def login_verify_otp(
 @router.post("/login/super-admin", status_code=status.HTTP_200_OK)
 async def login_super_admin(
     user: schemas.SuperUserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if user exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = (await db.execute(select(models.User).where(models.User.email == user.email))).scalars().first()
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -301,12 +303,12 @@ async def login_super_admin(
 async def forgotPassword(
     user: schemas.User,
     backround_task: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     errors = {}
-    db_user = db.query(models.User).filter(
+    db_user = (await db.execute(select(models.User).where(
         models.User.email == user.email,
-    ).first()
+    ))).scalars().first()
 
     if not db_user:
         raise HTTPException(
@@ -316,9 +318,7 @@ async def forgotPassword(
     reset_token = secrets.token_urlsafe(32)
     token_expires = datetime.now(timezone.utc) + timedelta(hours=1)
 
-    existing_token = db.query(models.PasswordResetToken).filter(
-        models.PasswordResetToken.email == user.email
-    ).first()
+    existing_token = await db.get(models.PasswordResetToken, user.email)
 
     if existing_token:
         existing_token.reset_token = reset_token
@@ -331,7 +331,7 @@ async def forgotPassword(
             token_expires=token_expires
         )
         db.add(new_reset_token)
-    db.commit()
+    await db.commit()
     reset_url = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
     backround_task.add_task(
         send_forgot_password_mail,
@@ -344,12 +344,12 @@ async def forgotPassword(
 @router.post('/reset-password', status_code=status.HTTP_200_OK)
 async def forgotPassword(
     request: schemas.ResetPassword,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     errors = {}
-    token_record = db.query(models.PasswordResetToken).filter(
+    token_record = (await db.execute(select(models.PasswordResetToken).where(
         models.PasswordResetToken.reset_token == request.token
-    ).first()
+    ))).scalars().first()
   
     if not token_record:
         raise HTTPException(
@@ -362,9 +362,9 @@ async def forgotPassword(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Token has Expired"
         )
-    user = db.query(models.User).filter(
+    user = (await db.execute(select(models.User).where(
         models.User.email == token_record.email
-    ).first()
+    ))).scalars().first()
     
     if not user:
       raise HTTPException(
@@ -374,9 +374,9 @@ async def forgotPassword(
     hashed_password = utils.get_password_hash(request.password)
     user.password_hash = hashed_password
     db.add(user)
-    db.delete(token_record)
+    await db.delete(token_record)
     
-    db.commit()
+    await db.commit()
 
     return {"message": "Password has been Updated"}
 
@@ -7,9 +7,10 @@ from core.app.env import settings
 from core.app.database import get_db
 from jose import jwt, JWTError
 from fastapi import Request, Depends, HTTPException, status
+from sqlalchemy import cast, literal, DateTime
 from sqlalchemy.orm import Session
 from fastapi.security import HTTPBasicCredentials, HTTPBasic, HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordBearer
-from . import models
+from . import models, repository
 from typing import Optional
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -46,8 +47,7 @@ def verify_basic_auth(credentials: HTTPBasicCredentials, db: Session):
         detail="Invalid Credentials",
         headers={"WWW-Authenticate": "Basic"},
     )
-    user = db.query(models.User).filter(
-        models.User.email == credentials.username).first()
+    user = repository.get_user_by_email(db, credentials.username)
     if not user:
         raise credentials_exception
     if not verify_password(credentials.password, user.password_hash):
@@ -69,8 +69,7 @@ def verify_bearer_token(token: str, db: Session):
             raise token_exception
     except JWTError:
         raise token_exception
-    user = db.query(models.User).filter(
-        models.User.id == user_id).first()
+    user = repository.get_user_by_id(db, user_id)
     if not user:
         raise token_exception
     return user
@@ -92,6 +91,12 @@ def loggedin_user(
         headers={"WWW-Authenticate": "Bearer,Basic"},
     )
 
+def otp_expires_at(seconds: int = 40):
+  # otp_requests.expires_at is a naive column. psycopg2 let Postgres convert the aware value
+  # to the session timezone; asyncpg rejects aware datetimes there, so do that cast explicitly.
+  expires = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+  return cast(literal(expires, DateTime(timezone=True)), DateTime)
+
 def generate_otp_v2():
   # Generate 6 random digits and shuffle
   digits = random.choices(string.digits, k=6)
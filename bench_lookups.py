@@ -0,0 +1,74 @@
+"""
+Micro-benchmark: per-call cost of the hot by-id lookups, ORM query rebuilt per call vs the
+prebuilt statements in */repository.py. Runs against in-memory SQLite so the database round
+trip is tiny and what's measured is mostly Python-side statement construction.
+
+    python bench_lookups.py [calls]
+"""
+import sys
+import timeit
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from core.app.database import Base
+from auth import models as auth_models, repository as auth_repository
+from travel import models as travel_models, repository as travel_repository
+from event import models as event_models, repository as event_repository
+
+
+def setup_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[
+        auth_models.User.__table__,
+        travel_models.County.__table__,
+        travel_models.Stop.__table__,
+        event_models.Venue.__table__,
+        event_models.Event.__table__,
+    ])
+    db = Session(engine)
+    db.add(auth_models.User(id=1, email="bench@example.com", phone="0300", status="active", role=auth_models.Role.admin))
+    db.add(travel_models.County(id=1, name="Dublin", short_code="DUB", telephone_code="01"))
+    db.add(travel_models.Stop(id=1, name="Bench Stop", county_id=1, location="Main St", lat=53.3, lng=-6.2))
+    db.add(event_models.Venue(id=1, name="Bench Venue", location="Main St", lat=53.3, lng=-6.2))
+    db.add(event_models.Event(
+        id=1, name="Bench Event", venue_id=1, desktop_image="d.jpg", mobile_image="m.jpg",
+        is_active=True, status=event_models.EventStatus.LIVE
+    ))
+    db.commit()
+    return db
+
+
+def main(calls: int = 20000):
+    db = setup_db()
+    cases = [
+        ("user by id",
+         lambda: db.query(auth_models.User).filter(auth_models.User.id == 1).first(),
+         lambda: auth_repository.get_user_by_id(db, 1)),
+        ("user by email",
+         lambda: db.query(auth_models.User).filter(auth_models.User.email == "bench@example.com").first(),
+         lambda: auth_repository.get_user_by_email(db, "bench@example.com")),
+        ("stop by id",
+         lambda: db.query(travel_models.Stop).filter(travel_models.Stop.id == 1).first(),
+         lambda: travel_repository.get_stop(db, 1)),
+        ("venue by id",
+         lambda: db.query(event_models.Venue).filter(event_models.Venue.id == 1).first(),
+         lambda: event_repository.get_venue(db, 1)),
+        ("public event by id",
+         lambda: db.query(event_models.Event).filter(
+             event_models.Event.id == 1,
+             event_models.Event.is_active == True,
+             event_models.Event.status != event_models.EventStatus.HIDDEN
+         ).first(),
+         lambda: event_repository.get_public_event(db, 1)),
+    ]
+
+    print(f"{'lookup':<20} {'orm query':>12} {'prebuilt':>12} {'saved':>8}")
+    for name, before, after in cases:
+        assert before() is after() is not None
+        # best of 5 runs, in microseconds per call
+        before_us = min(timeit.repeat(before, number=calls, repeat=5)) / calls * 1e6
+        after_us = min(timeit.repeat(after, number=calls, repeat=5)) / calls * 1e6
+        print(f"{name:<20} {before_us:>10.1f}us {after_us:>10.1f}us {1 - after_us / before_us:>7.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
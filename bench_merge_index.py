@@ -0,0 +1,119 @@
+"""
+Benchmark: merge detection for a new route template against N existing templates.
+
+Compares the per-candidate `is_matching_chain` scan (as find_matching_subsequence did it,
+here over in-memory nodes, so without any query cost) with the reversed stop-id trie in
+travel/graph_index.py, and checks both give the same answer.
+
+    python bench_merge_index.py [templates] [queries]
+"""
+import random
+import sys
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+import core.app  # noqa: F401 - loads the app's modules in dependency order
+from travel.graph_index import RouteGraphIndex
+from travel.utils import is_matching_chain, build_chain_from_node
+
+STOPS = 3000
+
+
+def build_templates(count: int, rng: random.Random) -> RouteGraphIndex:
+    """Create templates the way create_route does, so merges/branches look like production"""
+    index = RouteGraphIndex()
+    index.load([])
+    next_id = 1
+    tails = []
+
+    for route_id in range(1, count + 1):
+        if tails and rng.random() < 0.4:
+            # new prefix running into an existing route's tail -> merge
+            stops = rng.sample(range(STOPS), rng.randint(1, 6)) + rng.choice(tails)
+        else:
+            stops = rng.sample(range(STOPS), rng.randint(4, 16))
+        stops = list(dict.fromkeys(stops))
+
+        created = []
+        match = index.find_matching_subsequence(stops)
+        if match:
+            start_idx, chain = match
+            if start_idx == 0 and len(chain) > 1:
+                start_idx, chain = 1, chain[1:]
+            for stop_id in stops[:start_idx]:
+                created.append([next_id, None, stop_id])
+                next_id += 1
+            for a, b in zip(created, created[1:]):
+                a[1] = b[0]
+            created[-1][1] = chain[0]
+        else:
+            for stop_id in stops:
+                created.append([next_id, None, stop_id])
+                next_id += 1
+            for a, b in zip(created, created[1:]):
+                a[1] = b[0]
+
+        index.apply({n: (nxt, stop_id, route_id) for n, nxt, stop_id in created}, set(), set())
+        tails.append(stops[-rng.randint(2, min(5, len(stops))):])
+
+    return index, tails
+
+
+def scan_match(candidates_by_stop, target_stop_ids):
+    """
+    The original algorithm: try each start index, walk every candidate chain.
+    Route heads are skipped, as the index does: linking into one would hide that route.
+    """
+    for start_idx in range(len(target_stop_ids)):
+        subsequence = target_stop_ids[start_idx:]
+        if len(subsequence) < 2:
+            continue
+        for candidate in candidates_by_stop.get(subsequence[0], ()):
+            if candidate.next_stop_node is None or not candidate.previous_stop_node:
+                continue
+            if is_matching_chain(candidate, subsequence):
+                return start_idx, [n.id for n in build_chain_from_node(candidate, len(subsequence))]
+    return None
+
+
+def main(templates: int = 10000, queries: int = 2000):
+    rng = random.Random(42)
+    started = time.perf_counter()
+    index, tails = build_templates(templates, rng)
+    print(f"{templates} templates, {len(index.stop_of)} stop nodes, index built in {time.perf_counter() - started:.2f}s")
+
+    # Same graph as linked objects, for the scan
+    nodes = {n: SimpleNamespace(id=n, stop_id=s, next_stop_node=None, previous_stop_node=[]) for n, s in index.stop_of.items()}
+    for n, nxt in index.next_of.items():
+        nodes[n].next_stop_node = nodes.get(nxt)
+        if nxt in nodes:
+            nodes[nxt].previous_stop_node.append(nodes[n])
+    candidates_by_stop = defaultdict(list)
+    for n in sorted(nodes):
+        candidates_by_stop[nodes[n].stop_id].append(nodes[n])
+
+    routes = []
+    for _ in range(queries):
+        if rng.random() < 0.5:
+            stops = rng.sample(range(STOPS), rng.randint(1, 8)) + rng.choice(tails)
+        else:
+            stops = rng.sample(range(STOPS), rng.randint(4, 16))
+        routes.append(list(dict.fromkeys(stops)))
+
+    started = time.perf_counter()
+    expected = [scan_match(candidates_by_stop, r) for r in routes]
+    scan_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    got = [index.find_matching_subsequence(r) for r in routes]
+    trie_s = time.perf_counter() - started
+
+    assert got == expected, "trie and scan disagree"
+    print(f"{queries} lookups ({sum(1 for m in got if m)} merges found)")
+    print(f"  is_matching_chain scan: {scan_s / queries * 1e6:9.1f}us per route")
+    print(f"  reversed trie:          {trie_s / queries * 1e6:9.1f}us per route ({scan_s / trie_s:.0f}x)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -1,26 +1,52 @@
+import time
+_boot_started = time.perf_counter()
+
 from contextlib import asynccontextmanager
 
 
 from routes import router
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
-from .database import create_tables,create_db_if_not_exists
-from core.config.helper import clearPyCache,create_and_mount_initial_dirs
+from .database import prepare_schema,async_engine,start_pool_validator,stop_pool_validator,pool_stats,pool_budget,replica_engine,stick_to_primary
+from core.config.helper import precompile_bytecode,create_and_mount_initial_dirs
 from core.app.env import BASE_DIR,settings
 from pathlib import Path
-from travel.routes import router as travel_router
+import threading
+from travel.routes import router as travel_router, public_router as travel_public_router
 from event.routes import router as event_router
+from utils.gcs import gcs_storage
 
 from .rate_limiter import limiter
+from .query_stats import track_queries
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_if_not_exists()
-    create_tables()
+    imports_done = time.perf_counter()
+    print(
+        f"DB pool budget: {pool_budget['per_worker']} connections per worker "
+        f"({pool_budget['max_connections']} over {pool_budget['workers']} workers), "
+        f"sync {pool_budget['sync']}, async {pool_budget['async']}"
+    )
+    prepare_schema()
+    start_pool_validator()
+    ready = time.perf_counter()
+    print(
+        f"🚀 Cold start {(ready - _boot_started) * 1000:.0f}ms "
+        f"(imports {(imports_done - _boot_started) * 1000:.0f}ms, schema {(ready - imports_done) * 1000:.0f}ms)"
+    )
+    if settings.PRECOMPILE_ON_BOOT:
+        # Writes bytecode for modules not imported yet and for the next boot; off the startup path
+        threading.Thread(target=precompile_bytecode, name="precompile", daemon=True).start()
+    if settings.GCS_WARM_UP_ON_BOOT:
+        gcs_storage.warm_up()
     yield
-    clearPyCache()
+    stop_pool_validator()
+    print(f"DB pool stats: {pool_stats}")
+    await async_engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
     
 
 
@@ -38,14 +64,42 @@ app.add_middleware(
     allow_credentials=settings.ALLOW_CREDENTIALS,
     allow_methods=settings.ALLOW_METHODS,
     allow_headers=settings.ALLOW_HEADERS,
+    # Paging cursor of GET /travel/stops/
+    expose_headers=["X-Next-After-Id"],
 )
 
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """After a successful write, keep the client's reads on the primary for a moment"""
+    response = await call_next(request)
+    if (
+        replica_engine is not None
+        and request.method in ("POST", "PUT", "PATCH", "DELETE")
+        and response.status_code < 400
+    ):
+        stick_to_primary(response)
+    return response
+
+
+@app.middleware("http")
+async def sql_timing(request: Request, call_next):
+    """Count the request's SQL and report it in the Server-Timing header"""
+    if not settings.SQL_TIMING_ENABLED:
+        return await call_next(request)
+    with track_queries() as stats:
+        response = await call_next(request)
+    response.headers.append("Server-Timing", stats.server_timing())
+    return response
+
+
 
 
 
 
 app.include_router(router,prefix="/api")
+# Public travel routes first: /travel/stops/nearest must not fall into the admin /travel/stops/{stop_id}
+app.include_router(travel_public_router, prefix="/api")
 app.include_router(travel_router, prefix="/api")
 app.include_router(event_router, prefix="/api")
 
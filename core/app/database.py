@@ -1,24 +1,223 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, event, exc, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .env import settings
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.util import queue as sqla_queue
+from fastapi import Request, Response
+from .env import settings, BASE_DIR
+from .query_stats import install_query_listeners
 from urllib.parse import quote_plus
 from psycopg2 import OperationalError
+import threading
+import time
+
+class _TimedCheckoutMixin:
+  """Tracks how long checkouts wait for a connection and how many give up (pool_timeout)"""
+
+  _idle_only = threading.local()
+
+  def connect_idle(self):
+    """
+    Check out a connection only if one is idling in the pool; None instead of waiting or
+    opening a new one. It goes through the normal checkout, so pool_pre_ping tests it.
+    """
+    self._idle_only.active = True
+    try:
+      return self.connect()
+    except sqla_queue.Empty:
+      return None
+    finally:
+      self._idle_only.active = False
+
+  def _do_get(self):
+    if getattr(self._idle_only, "active", False):
+      return self._pool.get(False)
+    if not hasattr(self, "wait_stats"):
+      self.wait_stats = {"waits": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "timeouts": 0}
+      self._wait_lock = threading.Lock()
+    started = time.perf_counter()
+    try:
+      return super()._do_get()
+    except exc.TimeoutError:
+      with self._wait_lock:
+        self.wait_stats["timeouts"] += 1
+      raise
+    finally:
+      waited = (time.perf_counter() - started) * 1000
+      with self._wait_lock:
+        self.wait_stats["waits"] += 1
+        self.wait_stats["wait_ms_total"] += waited
+        self.wait_stats["wait_ms_max"] = max(self.wait_stats["wait_ms_max"], waited)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+  pass
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+  pass
+
+
+def _pool_limits(connections: int) -> dict:
+  """Half the share kept open, the rest as burst overflow"""
+  connections = max(connections, 1)
+  pool_size = (connections + 1) // 2
+  return {"pool_size": pool_size, "max_overflow": connections - pool_size}
+
+
+# DB_MAX_CONNECTIONS is for the whole deployment; every worker process has its own pools.
+# Most handlers are sync, so the sync pool gets two thirds of a worker's share.
+_worker_connections = max(settings.DB_MAX_CONNECTIONS // settings.SERVER_WORKERS, 2)
+_async_connections = max(_worker_connections // 3, 1)
+pool_budget = {
+  "max_connections": settings.DB_MAX_CONNECTIONS,
+  "workers": settings.SERVER_WORKERS,
+  "per_worker": _worker_connections,
+  "sync": _pool_limits(_worker_connections - _async_connections),
+  "async": _pool_limits(_async_connections),
+}
 
 # Create engine
 engine = create_engine(
   settings.SQLALCHEMY_DB_URL,
-  pool_size=10,
-  max_overflow=20,
-  pool_timeout=30,
-  pool_pre_ping=True,
-  pool_recycle=3600,
+  poolclass=TimedQueuePool,
+  **pool_budget["sync"],
+  pool_timeout=settings.DB_POOL_TIMEOUT,
+  pool_pre_ping=settings.DB_POOL_PRE_PING,
+  pool_recycle=settings.DB_POOL_RECYCLE,
   echo=False
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for `async def` handlers, so queries don't block the event loop
+async_engine = create_async_engine(
+  settings.SQLALCHEMY_ASYNC_DB_URL,
+  poolclass=TimedAsyncQueuePool,
+  **pool_budget["async"],
+  pool_timeout=settings.DB_POOL_TIMEOUT,
+  pool_pre_ping=settings.DB_POOL_PRE_PING,
+  pool_recycle=settings.DB_POOL_RECYCLE,
+  echo=False
+)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replica; read-only endpoints use it through get_read_db.
+# It is a separate server, so it takes the sync pool's sizing rather than a share of the primary's budget.
+replica_engine = None
+ReadSessionLocal = None
+if settings.SQLALCHEMY_REPLICA_DB_URL:
+  replica_engine = create_engine(
+    settings.SQLALCHEMY_REPLICA_DB_URL,
+    poolclass=TimedQueuePool,
+    **pool_budget["sync"],
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    echo=False
+  )
+  ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+
+def pool_status() -> dict:
+  """Live state of each connection pool in this worker"""
+  # name -> (pool, the budget it was sized with); the replica takes the sync sizing
+  pools = {"sync": (engine.pool, "sync"), "async": (async_engine.sync_engine.pool, "async")}
+  if replica_engine is not None:
+    pools["replica"] = (replica_engine.pool, "sync")
+
+  status = {}
+  for name, (pool, budget) in pools.items():
+    wait_stats = dict(getattr(pool, "wait_stats", {"waits": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "timeouts": 0}))
+    status[name] = {
+      "pool_size": pool.size(),
+      "max_overflow": pool_budget[budget]["max_overflow"],
+      "checked_out": pool.checkedout(),
+      "checked_in": pool.checkedin(),
+      "overflow": max(pool.overflow(), 0),
+      "waits": wait_stats["waits"],
+      "wait_ms_avg": round(wait_stats["wait_ms_total"] / wait_stats["waits"], 2) if wait_stats["waits"] else 0.0,
+      "wait_ms_max": round(wait_stats["wait_ms_max"], 2),
+      "timeouts": wait_stats["timeouts"],
+    }
+  return status
+
+
+# Connection liveness is handled by the pool (pre-ping on checkout, recycling, optional
+# background validation), not per request. These counters show how often it kicks in.
+pool_stats = {
+  "connects": 0,          # new DBAPI connections opened
+  "checkouts": 0,         # connections handed out (each one used to cost an extra SELECT 1)
+  "stale_invalidated": 0, # dead connections caught by pre-ping / the validator / errors
+  "recycled": 0,          # connections closed and replaced (stale, too old, or invalidated)
+  "validator_runs": 0,
+}
+_pool_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+  with _pool_stats_lock:
+    pool_stats[key] += 1
+
+
+for _target in (engine, async_engine.sync_engine, replica_engine):
+  if _target is None:
+    continue
+  event.listen(_target, "connect", lambda *args: _count("connects"))
+  event.listen(_target, "checkout", lambda *args: _count("checkouts"))
+  event.listen(_target, "invalidate", lambda *args: _count("stale_invalidated"))
+  event.listen(_target, "close", lambda *args: _count("recycled"))
+  install_query_listeners(_target)
+
+
+def validate_idle_connections():
+  """
+  Check out each connection idling in the sync pool so pool_pre_ping tests it, replacing
+  dead ones before a request gets them. Only idle connections are taken, one at a time and
+  without waiting, so requests aren't starved and no overflow connection is opened.
+  """
+  pool = engine.pool
+  # The pool is FIFO: each one handed back queues behind those not yet checked
+  for _ in range(pool.checkedin()):
+    conn = pool.connect_idle()
+    if conn is None:
+      break  # requests took the rest
+    conn.close()
+  _count("validator_runs")
+
+
+_validator_stop = threading.Event()
+
+
+def start_pool_validator():
+  """Start the background idle-connection validator if DB_POOL_VALIDATE_INTERVAL is set"""
+  interval = settings.DB_POOL_VALIDATE_INTERVAL
+  if interval <= 0:
+    return
+  if not settings.DB_POOL_PRE_PING:
+    print("⚠️ DB_POOL_VALIDATE_INTERVAL needs DB_POOL_PRE_PING, pool validator not started")
+    return
+
+  def run():
+    while not _validator_stop.wait(interval):
+      try:
+        validate_idle_connections()
+      except Exception as e:
+        print(f"❌ Pool validation failed: {e}")
+
+  _validator_stop.clear()
+  threading.Thread(target=run, name="db-pool-validator", daemon=True).start()
+  print(f"🩺 DB pool validator running every {interval}s")
+
+
+def stop_pool_validator():
+  _validator_stop.set()
+
 
 def get_db():
   """
@@ -26,21 +225,128 @@ def get_db():
   """
   db = SessionLocal()
   try:
-    # Test connection
-    db.execute(text("SELECT 1"))
     yield db
-  except Exception as e:
+  finally:
     db.close()
-    raise
+
+
+# Read-your-writes: after a client writes, its reads stay on the primary for a short
+# window so replica lag can't hide the change. Tracked with a cookie, so it holds across
+# workers; not by client address, which behind the proxy is the same for everyone.
+PRIMARY_STICKY_COOKIE = "tm_read_primary"
+_replica_down_until = 0.0
+
+
+def stick_to_primary(response: Response):
+  """Route this client's reads to the primary for DB_REPLICA_STICKY_SECONDS"""
+  seconds = settings.DB_REPLICA_STICKY_SECONDS
+  response.set_cookie(PRIMARY_STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True)
+
+
+def _reads_pinned_to_primary(request: Request) -> bool:
+  now = time.time()
+  if now < _replica_down_until:
+    return True
+  try:
+    return float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0)) > now
+  except ValueError:
+    return False
+
+
+def get_read_db(request: Request):
+  """
+  FastAPI dependency for read-only endpoints: a replica session when DATABASE_REPLICA_URL
+  is set, otherwise (or if the replica is unreachable, or right after the client wrote) the primary
+  """
+  global _replica_down_until
+
+  if ReadSessionLocal is None or _reads_pinned_to_primary(request):
+    yield from get_db()
+    return
+
+  db = ReadSessionLocal()
+  try:
+    # Check out a connection now so an unreachable replica falls back before the handler runs
+    db.connection()
+  except DBAPIError as e:
+    db.close()
+    _replica_down_until = time.time() + settings.DB_REPLICA_RETRY_SECONDS
+    print(f"❌ Read replica unavailable, using primary: {e}")
+    yield from get_db()
+    return
+
+  try:
+    yield db
   finally:
     db.close()
 
 
+async def get_async_db():
+  """
+  FastAPI dependency for async database sessions
+  """
+  async with AsyncSessionLocal() as db:
+    yield db
+
+
 def create_tables():
   """Create all tables"""
   Base.metadata.create_all(bind=engine)
 
 
+def migration_status() -> dict:
+  """Alembic revision the database is at vs the newest migration script"""
+  # alembic is only needed here; importing it at module level costs every cold start
+  from alembic.config import Config as AlembicConfig
+  from alembic.runtime.migration import MigrationContext
+  from alembic.script import ScriptDirectory
+
+  script = ScriptDirectory.from_config(AlembicConfig(str(BASE_DIR / "alembic.ini")))
+  with engine.connect() as conn:
+    current = MigrationContext.configure(conn).get_current_revision()
+  head = script.get_current_head()
+  return {"current": current, "head": head, "at_head": current is not None and current == head}
+
+
+def missing_tables() -> list[str]:
+  """Model tables not in the database (many have no migration; create_all provisions them)"""
+  existing = set(inspect(engine).get_table_names())
+  return [name for name in Base.metadata.tables if name not in existing]
+
+
+def prepare_schema():
+  """
+  Startup schema step. With DB_FAST_STARTUP, a database already migrated to the alembic head
+  (the Procfile runs `alembic upgrade head` before the app starts) and holding every model's
+  table skips database creation and create_all; the full checks then only run on demand
+  through check_schema().
+  """
+  if settings.DB_FAST_STARTUP:
+    try:
+      status = migration_status()
+      missing = missing_tables()
+      if status["at_head"] and not missing:
+        print(f"⚡ Schema at alembic head ({status['head']}), skipping create_all")
+        return
+      if missing:
+        print(f"Tables missing from the database ({', '.join(missing)}): running full schema setup")
+      else:
+        print(f"Schema at {status['current']}, alembic head is {status['head']}: running full schema setup")
+    except Exception as e:
+      print(f"Note: Could not read alembic version, running full schema setup: {e}")
+
+  create_db_if_not_exists()
+  create_tables()
+
+
+def check_schema() -> dict:
+  """On-demand full check: migration status plus creating any tables missing from the database"""
+  missing = missing_tables()
+  if missing:
+    create_tables()
+  return {**migration_status(), "created_tables": missing}
+
+
 def create_db_if_not_exists():
   """Create database if not there"""
   # Skip creation in production or if using a pre-configured DATABASE_URL
@@ -1,12 +1,24 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlsplit, urlunsplit, parse_qsl, urlencode
 from typing import List
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
+def _psycopg2_url(url: str) -> str:
+    # SQLAlchemy 1.4+ and 2.0 require 'postgresql://' instead of 'postgres://'
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+
+    # Ensure the driver is specified if not present
+    if "postgresql://" in url and "postgresql+psycopg2://" not in url:
+        url = url.replace("postgresql://", "postgresql+psycopg2://", 1)
+
+    return url
+
+
 class Settings(BaseSettings):
     APP_NAME: str = 'Travel Master'
     FRONTEND_URL: str = 'http://localhost:1598'
@@ -18,6 +30,11 @@ class Settings(BaseSettings):
     # Railway / Prod
     DATABASE_PUBLIC_URL: str | None = None
 
+    # Optional read replica for read-only endpoints
+    DATABASE_REPLICA_URL: str | None = None
+    DB_REPLICA_STICKY_SECONDS: int = 5  # reads go to primary this long after a client's write
+    DB_REPLICA_RETRY_SECONDS: int = 30  # after a failed replica connect, use primary this long
+
     # Local DB (fallback)
     DB_HOST: str = "localhost"
     DB_PORT: int = 5432
@@ -25,6 +42,32 @@ class Settings(BaseSettings):
     DB_PASS: str = "test123"
     DB_NAME: str = "app_db"
 
+    # DB connection budget: total for the deployment (all workers and pools), split per worker
+    DB_MAX_CONNECTIONS: int = 40
+    DB_POOL_TIMEOUT: int = 30
+
+    # Skip database creation / create_all on boot when migrations are already at head
+    DB_FAST_STARTUP: bool = True
+    # Compile project bytecode in the background after boot (images do it at build time instead)
+    PRECOMPILE_ON_BOOT: bool = False
+
+    # DB pool liveness
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_VALIDATE_INTERVAL: int = 0  # seconds between background checks of idle connections, 0 = off
+
+    # Per-request SQL stats (Server-Timing header) and N+1 detection
+    SQL_TIMING_ENABLED: bool = True
+    SQL_REPEAT_LIMIT: int = 10  # same statement more often than this in one request is reported
+    SQL_STRICT: bool = False  # raise instead of just logging (for tests)
+
+    # In-memory snapshots behind hot public reads (core/app/snapshot.py); bounds staleness across workers
+    SNAPSHOT_TTL_SECONDS: int = 60
+
+    # Travel-time estimate from straight-line distance (travel/distances.py)
+    TRAVEL_ROAD_FACTOR: float = 1.3  # road distance / great-circle distance
+    TRAVEL_AVG_SPEED_KMH: float = 45.0
+
     # CORS
     ALLOW_ORIGINS: str = "*"
     ALLOW_CREDENTIALS: bool = False
@@ -40,23 +83,32 @@ class Settings(BaseSettings):
     def SQLALCHEMY_DB_URL(self) -> str:
         """Prefer Railway DATABASE_URL, fallback to local config"""
         if self.DATABASE_PUBLIC_URL:
-            # SQLAlchemy 1.4+ and 2.0 require 'postgresql://' instead of 'postgres://'
             url = self.DATABASE_PUBLIC_URL
             print(url)
-            if url.startswith("postgres://"):
-                url = url.replace("postgres://", "postgresql://", 1)
-            
-            # Ensure the driver is specified if not present
-            if "postgresql://" in url and "postgresql+psycopg2://" not in url:
-                url = url.replace("postgresql://", "postgresql+psycopg2://", 1)
-            
-            return url
+            return _psycopg2_url(url)
 
         return (
             f"postgresql+psycopg2://{self.DB_USER}:{quote_plus(self.DB_PASS)}"
             f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME if hasattr(self, 'DB_NAME') else 'app_db'}"
         )
     @property
+    def SQLALCHEMY_REPLICA_DB_URL(self) -> str | None:
+        """Read replica URL, if one is configured"""
+        if not self.DATABASE_REPLICA_URL:
+            return None
+        return _psycopg2_url(self.DATABASE_REPLICA_URL)
+
+    @property
+    def SQLALCHEMY_ASYNC_DB_URL(self) -> str:
+        """Same database as SQLALCHEMY_DB_URL, reached through the asyncpg driver"""
+        url = self.SQLALCHEMY_DB_URL.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+
+        # asyncpg takes 'ssl' instead of libpq's 'sslmode'
+        parts = urlsplit(url)
+        query = [("ssl", v) if k == "sslmode" else (k, v) for k, v in parse_qsl(parts.query)]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    @property
     def ALLOW_ORIGINS_LIST(self) -> list[str]:
         return [origin.strip() for origin in self.ALLOW_ORIGINS.split(",")]
       
@@ -73,6 +125,10 @@ class Settings(BaseSettings):
     @property
     def IS_PROD(self) -> bool:
         return not self.IS_DEV
+    @property
+    def SERVER_WORKERS(self) -> int:
+        """Worker processes main.py starts, each with its own DB pools"""
+        return max(self.WORKERS, 1) if self.IS_PROD else 1
     # SMTP
     SMTP_USERNAME: str = "info@travelmaster.com"
     SMTP_PASSWORD: str = "J{=#KUjH]P7X@7^4"
@@ -82,6 +138,7 @@ class Settings(BaseSettings):
     MAIL_FROM_NAME: str = "Travel Master"
     # GCS
     GCS_BUCKET_NAME: str = "tm_images"
+    GCS_WARM_UP_ON_BOOT: bool = False  # build the storage client in the background at startup
     GCS_TYPE: str | None = None
     GCS_PROJECT_ID: str | None = None
     GCS_PRIVATE_KEY_ID: str | None = None
@@ -0,0 +1,103 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from .env import settings
+import re
+import time
+
+
+class RepeatedQueryError(AssertionError):
+  """Raised in strict mode when one request runs the same statement too many times (N+1)"""
+
+
+class QueryStats:
+  """SQL executed during one request (or one `track_queries` block)"""
+
+  def __init__(self, repeat_limit: int | None = None, strict: bool | None = None):
+    self.count = 0
+    self.total_ms = 0.0
+    self.statements = Counter()
+    self.repeat_limit = settings.SQL_REPEAT_LIMIT if repeat_limit is None else repeat_limit
+    self.strict = settings.SQL_STRICT if strict is None else strict
+    self._reported = set()
+
+  def record(self, statement: str):
+    shape = statement_shape(statement)
+    self.count += 1
+    self.statements[shape] += 1
+
+    times = self.statements[shape]
+    if self.repeat_limit and times > self.repeat_limit and shape not in self._reported:
+      self._reported.add(shape)
+      message = f"Statement ran more than {self.repeat_limit} times in one request: {shape[:200]}"
+      if self.strict:
+        raise RepeatedQueryError(message)
+      print(f"⚠️ Possible N+1 - {message}")
+
+  @property
+  def max_repeat(self) -> int:
+    return max(self.statements.values(), default=0)
+
+  def server_timing(self) -> str:
+    """Value for the Server-Timing response header"""
+    return (
+      f'db;dur={self.total_ms:.1f};desc="{self.count} queries", '
+      f'db-repeat;desc="max {self.max_repeat}x same statement"'
+    )
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists render one placeholder per value; collapse them so list length doesn't change the shape
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:%\(\w+\)s|\$\d+)(?:\s*,\s*(?:%\(\w+\)s|\$\d+))*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+  """Statement text with whitespace and IN-list lengths normalised"""
+  statement = _WHITESPACE.sub(" ", statement).strip()
+  return _PLACEHOLDER_LIST.sub("(?)", statement)
+
+
+@contextmanager
+def track_queries(repeat_limit: int | None = None, strict: bool | None = None):
+  """
+  Collect SQL stats for the enclosed block. Used per request by the middleware; in tests,
+  `with track_queries(repeat_limit=3, strict=True):` fails on N+1 patterns.
+  """
+  stats = QueryStats(repeat_limit, strict)
+  token = _current_stats.set(stats)
+  try:
+    yield stats
+  finally:
+    _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  stats = _current_stats.get()
+  if stats is None:
+    return
+  stats.record(statement)
+  conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  stats = _current_stats.get()
+  if stats is None or not conn.info.get("query_start"):
+    return
+  stats.total_ms += (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+
+
+def _handle_error(exception_context):
+  # Failed statements never reach after_cursor_execute; drop their start time
+  conn = exception_context.connection
+  if conn is not None and conn.info.get("query_start") and _current_stats.get() is not None:
+    conn.info["query_start"].pop()
+
+
+def install_query_listeners(target):
+  """Attach the stats hooks to a (sync) Engine"""
+  event.listen(target, "before_cursor_execute", _before_cursor_execute)
+  event.listen(target, "after_cursor_execute", _after_cursor_execute)
+  event.listen(target, "handle_error", _handle_error)
@@ -0,0 +1,121 @@
+"""
+In-process snapshots for hot, read-mostly endpoints.
+
+A snapshot is built from the database once by a loader and then served from memory. A
+commit in this process that affects it calls `invalidate`; otherwise it is rebuilt after
+SNAPSHOT_TTL_SECONDS, so writes made by other workers show up within that window.
+Loaders always run on a primary session, never the request's (possibly replica) one, so a
+rebuild right after an invalidating commit can't cache rows a replica hasn't replayed yet.
+"""
+from collections import OrderedDict
+import gzip
+import hashlib
+import json
+import threading
+import time
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from .env import settings
+from .database import SessionLocal
+
+
+class SnapshotCache:
+  """Snapshots per key, built by `loader(db, key)` on a primary session"""
+
+  def __init__(self, name: str, loader, ttl: int | None = None, max_entries: int = 256):
+    self.name = name
+    self.loader = loader
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.stats = {"hits": 0, "builds": 0, "invalidations": 0}
+    self._entries: OrderedDict = OrderedDict()  # key -> (built_at, value)
+    self._generation = 0  # bumped by every invalidate, so builds racing a write aren't kept
+    self._build_locks = [threading.Lock() for _ in range(16)]  # striped by key
+    self._lock = threading.Lock()
+
+  def _ttl(self) -> int:
+    return settings.SNAPSHOT_TTL_SECONDS if self.ttl is None else self.ttl
+
+  def _fresh(self, key):
+    entry = self._entries.get(key)
+    if entry is not None and time.monotonic() - entry[0] < self._ttl():
+      return entry
+    return None
+
+  def get(self, key=None):
+    entry = self._fresh(key)
+    if entry is not None:
+      self.stats["hits"] += 1
+      return entry[1]
+
+    # One build per key at a time; concurrent requests for the same key wait for it
+    with self._build_locks[hash(key) % len(self._build_locks)]:
+      entry = self._fresh(key)
+      if entry is not None:
+        self.stats["hits"] += 1
+        return entry[1]
+
+      generation = self._generation
+      started = time.monotonic()
+      with SessionLocal() as db:
+        value = self.loader(db, key)
+      self.stats["builds"] += 1
+      print(f"📸 Snapshot {self.name}[{key}] built in {(time.monotonic() - started) * 1000:.1f}ms")
+
+      with self._lock:
+        # None (nothing for this key) isn't kept, so unknown keys can't push real entries out
+        if value is not None and self._generation == generation:
+          self._entries[key] = (started, value)
+          self._entries.move_to_end(key)
+          while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+      return value
+
+  def invalidate(self, key=None):
+    with self._lock:
+      self._generation += 1
+      self._entries.pop(key, None)
+      self.stats["invalidations"] += 1
+
+  def invalidate_many(self, keys):
+    with self._lock:
+      self._generation += 1
+      for key in keys:
+        self._entries.pop(key, None)
+      self.stats["invalidations"] += 1
+
+  def clear(self):
+    with self._lock:
+      self._generation += 1
+      self._entries.clear()
+
+
+class Payload:
+  """
+  A JSON response body serialized and gzipped once, for snapshots served as is.
+  `response` answers If-None-Match with 304 and picks the gzip body when the client takes it.
+  """
+
+  def __init__(self, data):
+    self.body = json.dumps(jsonable_encoder(data), separators=(",", ":")).encode()
+    self.gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+    digest = hashlib.sha256(self.body).hexdigest()[:32]
+    # Strong ETags differ per encoding, since the bytes do
+    self.etag = f'"{digest}"'
+    self.gzip_etag = f'"{digest}-gz"'
+
+  def response(self, request: Request) -> Response:
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    etag = self.gzip_etag if use_gzip else self.etag
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+      tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+      if "*" in tags or self.etag in tags or self.gzip_etag in tags:
+        return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+      headers["Content-Encoding"] = "gzip"
+      return Response(content=self.gzipped, media_type="application/json", headers=headers)
+    return Response(content=self.body, media_type="application/json", headers=headers)
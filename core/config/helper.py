@@ -1,5 +1,9 @@
 from subprocess import run
 from core.app.env import BASE_DIR
+from collections import defaultdict
+import compileall
+import re
+import sys
 from .file_storage import initial_dirs
 import shutil
 from pathlib import Path
@@ -24,6 +28,64 @@ def clearPyCache():
         print(f"❌ Cleanup failed: {e}")
 
 
+# Not part of the app's source: skipped when precompiling
+PRECOMPILE_SKIP = re.compile(r"[/\\](\.?venv|node_modules|media|public|\.git)([/\\]|$)")
+
+
+def precompile_bytecode() -> bool:
+    """
+    Compile the project's modules to __pycache__ ahead of time (build step or PRECOMPILE_ON_BOOT),
+    so workers load bytecode instead of compiling source on a cold start. Up-to-date files are skipped.
+    """
+    try:
+        ok = compileall.compile_dir(BASE_DIR, rx=PRECOMPILE_SKIP, quiet=1, workers=0)
+        print(f"{'✅' if ok else '❌'} Precompiled bytecode in: {BASE_DIR}")
+        return bool(ok)
+    except Exception as e:
+        print(f"❌ Precompile failed: {e}")
+        return False
+
+
+def import_time_report(module: str = "core.app", top: int = 25):
+    """
+    Import `module` in a fresh interpreter with `-X importtime` and print the slowest imports
+    (cumulative, in ms) plus a per top-level package total. Returns the parsed rows.
+    """
+    result = run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+
+    if result.returncode != 0:
+        print(f"❌ Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = defaultdict(float)
+    for row in rows:
+        packages[row["module"].split(".")[0]] += row["self_ms"]
+
+    total = sum(packages.values())
+    print(f"Import time for {module}: {total:.0f}ms across {len(rows)} modules")
+    print("\nSlowest imports (cumulative):")
+    for row in sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]:
+        print(f"  {row['cumulative_ms']:9.1f}ms  {row['module']}")
+    print("\nBy top-level package (self time):")
+    for package, ms in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f"  {ms:9.1f}ms  {package}")
+
+    return rows
+
+
 def create_initial_dirs():
     try:
         for dir in initial_dirs:
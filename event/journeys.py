@@ -0,0 +1,157 @@
+"""
+Journey search: which routes of an event day serve stop A and then stop B.
+
+Each event day gets a reachability index (stop_id -> sorted positions per route walk),
+built with one query and kept as a snapshot, so a search is a few dict lookups and a bisect
+instead of a chain walk. A branched route has one walk per head, and pickup and drop-off
+must lie on the same one. Committed writes to events, days, routes or their stop nodes
+drop the affected days' snapshots; they are rebuilt lazily.
+"""
+from bisect import bisect_right
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from core.app.snapshot import SnapshotCache
+from travel.stop_paths import stop_path_walk
+from .models import Event, EventDay, EventRoute, EventStatus, EventStopNode
+
+
+class DayJourneyIndex:
+    def __init__(self, day_id: int):
+        self.day_id = day_id
+        self.routes: dict[int, dict] = {}                         # route id -> route fields
+        self.stops: dict[tuple, list[dict]] = {}                  # (route id, head id) -> stops along that walk
+        self.positions: dict[int, dict[tuple, list[int]]] = {}    # stop id -> walk -> sorted positions
+
+    def add_stop(self, route_id: int, head_id: int, stop: dict):
+        stops = self.stops.setdefault((route_id, head_id), [])
+        self.positions.setdefault(stop["stop_id"], {}).setdefault((route_id, head_id), []).append(len(stops))
+        stops.append(stop)
+
+    def search(self, from_stop_id: int, to_stop_id: int) -> list[dict]:
+        """
+        Routes where from_stop comes before to_stop on the same walk; earliest active pickup,
+        first drop-off after it, from the route's first walk (by head id) that has one
+        """
+        to_positions = self.positions.get(to_stop_id, {})
+        results = {}
+        for walk, from_positions in self.positions.get(from_stop_id, {}).items():
+            route_id = walk[0]
+            later = to_positions.get(walk)
+            if route_id in results or not later:
+                continue
+            stops = self.stops[walk]
+            for pickup_at in from_positions:
+                if not stops[pickup_at]["is_active"]:
+                    continue
+                i = bisect_right(later, pickup_at)
+                while i < len(later) and not stops[later[i]]["is_active"]:
+                    i += 1
+                if i < len(later):
+                    results[route_id] = {
+                        **self.routes[route_id],
+                        "pickup": stops[pickup_at],
+                        "dropoff": stops[later[i]],
+                        "stops_between": later[i] - pickup_at - 1,
+                    }
+                    break
+        return [results[route_id] for route_id in sorted(results)]
+
+
+def load_day_journey_index(db: Session, day_id: int) -> DayJourneyIndex | None:
+    day = db.get(EventDay, day_id)
+    if day is None or not day.event.is_active or day.event.status == EventStatus.HIDDEN:
+        return None
+
+    index = DayJourneyIndex(day_id)
+    routes = (
+        db.query(EventRoute)
+        .filter(EventRoute.event_day_id == day_id, EventRoute.is_active.is_(True))
+        .all()
+    )
+    for route in routes:
+        index.routes[route.id] = {
+            "route_id": route.id,
+            "route_name": route.name,
+            "group_id": route.group_id,
+            "start_location": route.start_location,
+            "destination": route.destination,
+        }
+    if not routes:
+        return index
+
+    walk = stop_path_walk(EventStopNode, list(index.routes))
+    rows = db.execute(
+        select(
+            walk.c.route_id,
+            walk.c.head_id,
+            EventStopNode.id,
+            EventStopNode.stop_id,
+            EventStopNode.price,
+            EventStopNode.pickup_time,
+            EventStopNode.is_active,
+        )
+        .select_from(walk)
+        .join(EventStopNode, EventStopNode.id == walk.c.node_id)
+        .order_by(walk.c.route_id, walk.c.head_id, walk.c.position)
+    ).all()
+    for route_id, head_id, node_id, stop_id, price, pickup_time, is_active in rows:
+        index.add_stop(route_id, head_id, {
+            "node_id": node_id,
+            "stop_id": stop_id,
+            "price": price,
+            "pickup_time": pickup_time,
+            "is_active": is_active is not False,
+        })
+    return index
+
+
+journey_index = SnapshotCache("journeys", load_day_journey_index)
+
+
+# -----------------------------
+# Session hooks: drop the journey index of every day a committed write touches
+# -----------------------------
+@event.listens_for(Session, "after_flush")
+def _note_journey_writes(session, flush_context):
+    days, route_ids, event_ids = set(), set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        # loaded state only, so deleted/expired objects aren't reloaded here
+        if isinstance(obj, EventDay):
+            days.add(vars(obj).get("id"))
+        elif isinstance(obj, EventRoute):
+            # the day it moved from, as well as the one it is on
+            days.add(vars(obj).get("event_day_id"))
+            days.update(inspect(obj).attrs.event_day_id.history.deleted or ())
+        elif isinstance(obj, EventStopNode):
+            route_ids.add(vars(obj).get("route_id"))
+        elif isinstance(obj, Event) and obj not in session.new:
+            # is_active / status decide whether any of its days are served
+            if obj in session.deleted or any(
+                inspect(obj).attrs[key].history.has_changes() for key in ("is_active", "status")
+            ):
+                event_ids.add(vars(obj).get("id"))
+    route_ids.discard(None)
+    event_ids.discard(None)
+    if route_ids:
+        days.update(session.connection().execute(
+            select(EventRoute.event_day_id).where(EventRoute.id.in_(route_ids))
+        ).scalars())
+    if event_ids:
+        days.update(session.connection().execute(
+            select(EventDay.id).where(EventDay.event_id.in_(event_ids))
+        ).scalars())
+    days.discard(None)
+    if days:
+        session.info.setdefault("journey_days", set()).update(days)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_days(session):
+    days = session.info.pop("journey_days", None)
+    if days:
+        journey_index.invalidate_many(days)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_days(session):
+    session.info.pop("journey_days", None)
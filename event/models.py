@@ -3,7 +3,8 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.app.database import Base
 from datetime import date, time, datetime
 import enum
-from sqlalchemy import String, Text, DateTime, Enum, JSON, Boolean, ForeignKey, Date, Time, Integer, Float
+from sqlalchemy import String, Text, DateTime, Enum, JSON, Boolean, ForeignKey, Date, Time, Integer, Float, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from typing import Optional
 
 class Venue(Base):
@@ -135,6 +136,13 @@ class EventRoute(Base):
     destination: Mapped[str] = mapped_column(String(255))
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
+    # Ordered stop ids along the route's chain, maintained by travel.stop_paths
+    stop_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer), default=list, server_default="{}")
+
+    __table_args__ = (
+        Index("ix_event_routes_stop_ids", "stop_ids", postgresql_using="gin"),
+    )
+
     event_day: Mapped["EventDay"] = relationship(
         "EventDay",
         back_populates="routes"
@@ -152,7 +160,7 @@ class EventStopNode(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     route_id: Mapped[int] = mapped_column(
-        ForeignKey("event_routes.id", ondelete="CASCADE")
+        ForeignKey("event_routes.id", ondelete="CASCADE"), index=True
     )
     stop_id: Mapped[int] = mapped_column(ForeignKey("stops.id"))
     price: Mapped[float] = mapped_column(Float)
@@ -168,7 +176,7 @@ class EventStopNode(Base):
 
     # Branching/Linking
     next_stop_id: Mapped[int | None] = mapped_column(
-        ForeignKey("event_stop_nodes.id"), nullable=True
+        ForeignKey("event_stop_nodes.id"), nullable=True, index=True
     )
 
     route: Mapped["EventRoute"] = relationship(
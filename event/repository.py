@@ -0,0 +1,27 @@
+"""
+Hot venue/event lookups, built once at import with bound parameters (see auth/repository.py).
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+from . import models
+
+VENUE_BY_ID = select(models.Venue).where(models.Venue.id == bindparam("venue_id")).limit(1)
+EVENT_BY_ID = select(models.Event).where(models.Event.id == bindparam("event_id")).limit(1)
+PUBLIC_EVENT_BY_ID = select(models.Event).where(
+    models.Event.id == bindparam("event_id"),
+    models.Event.is_active == True,
+    models.Event.status != models.EventStatus.HIDDEN
+).limit(1)
+
+
+def get_venue(db: Session, venue_id: int) -> models.Venue | None:
+    return db.execute(VENUE_BY_ID, {"venue_id": venue_id}).scalars().first()
+
+
+def get_event(db: Session, event_id: int) -> models.Event | None:
+    return db.execute(EVENT_BY_ID, {"event_id": event_id}).scalars().first()
+
+
+def get_public_event(db: Session, event_id: int) -> models.Event | None:
+    """Active, non-hidden event"""
+    return db.execute(PUBLIC_EVENT_BY_ID, {"event_id": event_id}).scalars().first()
@@ -1,18 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, func
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from core.app.database import get_db
+from core.app.database import get_db, get_async_db, get_read_db
 from auth.utils import super_admin_only
-from . import models, schemas
+from . import models, schemas, repository
 from datetime import date, time, datetime
 from .models import Event, EventDay, EventStatus, EventRoute, EventStopNode
 import os
 from uuid import uuid4
-from fastapi import Form, File, UploadFile
+from fastapi import Form, File, UploadFile, Query
 import json
+from pydantic import ValidationError
 from fastapi import APIRouter, Form, File, UploadFile, HTTPException, Depends, Request
 from utils.gcs import gcs_storage
-from .utils import find_matching_subsequence, cleanup_node_references, attach_full_stop_nodes, create_event_route_logic
+from .utils import find_matching_subsequence, cleanup_node_references, load_full_stop_nodes, create_event_route_logic, replace_event_day_routes
+from travel.stop_paths import routes_passing
+from .journeys import journey_index
+from .spatial import venue_index, venue_geojson
+from travel import schemas as travel_schemas
+from utils.geo import parse_bbox
 
 router = APIRouter(prefix="/event", tags=["Events"])
 
@@ -25,36 +34,44 @@ def create_venue(venue: schemas.VenueCreate, db: Session = Depends(get_db)):
     return db_venue
 
 @router.get("/venues/", response_model=List[schemas.VenueOut])
-def read_venues(db: Session = Depends(get_db)):
+def read_venues(db: Session = Depends(get_read_db)):
     venues = db.query(models.Venue).all()
     return venues
 
 @router.get("/venues/geojson", response_model=schemas.VenueGeoJSONFeatureCollection)
-def read_venues_geojson(db: Session = Depends(get_db)):
-    venues = db.query(models.Venue).all()
-    features = [venue.to_geojson() for venue in venues]
-    return {
-        "type": "FeatureCollection",
-        "features": features
-    }
+def read_venues_geojson(request: Request):
+    """Pre-serialized (gzip when accepted) with an ETag; If-None-Match gets a 304"""
+    return venue_geojson.get().response(request)
+
+@router.get("/venues/clusters", response_model=travel_schemas.MapFeatureCollection)
+def read_venue_clusters(bbox: str, zoom: int = Query(..., ge=0, le=22)):
+    """
+    Venues in the viewport as GeoJSON, clustered for the zoom level.
+    bbox: "min_lng,min_lat,max_lng,max_lat". Cluster features carry point_count.
+    """
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {e}")
+    return venue_index.get().cluster_geojson(box, zoom)
 
 @router.get("/venues/{venue_id}", response_model=schemas.VenueOut)
-def read_venue(venue_id: int, db: Session = Depends(get_db)):
-    venue = db.query(models.Venue).filter(models.Venue.id == venue_id).first()
+def read_venue(venue_id: int, db: Session = Depends(get_read_db)):
+    venue = repository.get_venue(db, venue_id)
     if venue is None:
         raise HTTPException(status_code=404, detail="Venue not found")
     return venue
 
 @router.get("/venues/{venue_id}/geojson", response_model=schemas.VenueGeoJSONFeature)
-def read_venue_geojson(venue_id: int, db: Session = Depends(get_db)):
-    venue = db.query(models.Venue).filter(models.Venue.id == venue_id).first()
+def read_venue_geojson(venue_id: int, db: Session = Depends(get_read_db)):
+    venue = repository.get_venue(db, venue_id)
     if venue is None:
         raise HTTPException(status_code=404, detail="Venue not found")
     return venue.to_geojson()
 
 @router.put("/venues/{venue_id}", response_model=schemas.VenueOut, dependencies=[Depends(super_admin_only)])
 def update_venue(venue_id: int, venue_update: schemas.VenueUpdate, db: Session = Depends(get_db)):
-    venue = db.query(models.Venue).filter(models.Venue.id == venue_id).first()
+    venue = repository.get_venue(db, venue_id)
     if venue is None:
         raise HTTPException(status_code=404, detail="Venue not found")
     
@@ -68,7 +85,7 @@ def update_venue(venue_id: int, venue_update: schemas.VenueUpdate, db: Session =
 
 @router.delete("/venues/{venue_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(super_admin_only)])
 def delete_venue(venue_id: int, db: Session = Depends(get_db)):
-    venue = db.query(models.Venue).filter(models.Venue.id == venue_id).first()
+    venue = repository.get_venue(db, venue_id)
     if venue is None:
         raise HTTPException(status_code=404, detail="Venue not found")
     
@@ -83,7 +100,7 @@ os.makedirs(MEDIA_ROOT, exist_ok=True)
 @router.post("/admin/events", status_code=201, dependencies=[Depends(super_admin_only)])
 async def create_event(
     request: Request,                   # 1️⃣ No default → first
-    db: Session = Depends(get_db),      # 2️⃣ Default → after non-defaults
+    db: AsyncSession = Depends(get_async_db),      # 2️⃣ Default → after non-defaults
     name: str = Form(...),
     venue_id: int = Form(...),
     desktop_image: UploadFile = File(...),
@@ -125,7 +142,7 @@ async def create_event(
     )
 
     db.add(event)
-    db.flush()
+    await db.flush()
 
     # Add EventDays
     for d in days_data:
@@ -146,59 +163,58 @@ async def create_event(
             note=d.get("note")
         )
         db.add(day_obj)
-        db.flush()
+        await db.flush()
 
         # Handle nested routes
         routes_data = d.get("routes", [])
         for r in routes_data:
-            # Since d is a dict from json.loads, r is also a dict
-            # create_event_route_logic expects an object with attributes or a dict helper
-            # I can convert it to a dot-dict or update the logic to handle dicts
-            from types import SimpleNamespace
-            
-            # Helper to recursively convert dict to SimpleNamespace for getattr compatibility
-            def dict_to_sns(d):
-                if isinstance(d, list):
-                    return [dict_to_sns(i) for i in d]
-                elif isinstance(d, dict):
-                    return SimpleNamespace(**{k: dict_to_sns(v) for k, v in d.items()})
-                return d
+            # Since d is a dict from json.loads, r is also a dict.
+            # Validate it into the route schema so times etc. arrive as real types
+            # (asyncpg, unlike psycopg2, won't coerce strings for TIME columns)
+            try:
+                r_obj = schemas.EventRouteCreate.model_validate(r)
+            except ValidationError as e:
+                raise HTTPException(400, f"Invalid route data: {e.errors()}")
 
-            r_obj = dict_to_sns(r)
-            create_event_route_logic(db, day_obj.id, r_obj)
+            await db.run_sync(create_event_route_logic, day_obj.id, r_obj)
 
-    db.commit()
-    db.refresh(event)
+    await db.commit()
 
     # Generate image URLs
     desktop_url = gcs_storage.get_public_url(desktop_path)
     mobile_url = gcs_storage.get_public_url(mobile_path)
 
-    return {
-        "id": event.id,
-        "name": event.name,
-        "venue_id": event.venue_id,
-        "desktop_image_url": desktop_url,
-        "mobile_image_url": mobile_url,
-        "description": event.description,
-        "description_metadata": event.description_metadata,
-        "status": event.status.value,
-        "category": event.category,
-        "is_active": event.is_active,
-        "days": [
-            {
-                "id": day.id,
-                "event_date": day.event_date,
-                "gate_open_time": day.gate_open_time.strftime("%H:%M:%S"),
-                "note": day.note,
-                "routes": [
-                    schemas.EventRouteOut.model_validate(attach_full_stop_nodes(route))
-                    for route in day.routes
-                ]
-            }
-            for day in event.days
-        ]
-    }
+    # The response walks lazy-loaded route chains, so build it on the session's sync side
+    def build_response(session: Session):
+        session.refresh(event)
+        load_full_stop_nodes(session, [route for day in event.days for route in day.routes])
+        return {
+            "id": event.id,
+            "name": event.name,
+            "venue_id": event.venue_id,
+            "desktop_image_url": desktop_url,
+            "mobile_image_url": mobile_url,
+            "description": event.description,
+            "description_metadata": event.description_metadata,
+            "status": event.status.value,
+            "category": event.category,
+            "is_active": event.is_active,
+            "days": [
+                {
+                    "id": day.id,
+                    "event_date": day.event_date,
+                    "gate_open_time": day.gate_open_time.strftime("%H:%M:%S"),
+                    "note": day.note,
+                    "routes": [
+                        schemas.EventRouteOut.model_validate(route)
+                        for route in day.routes
+                    ]
+                }
+                for day in event.days
+            ]
+        }
+
+    return await db.run_sync(build_response)
 
 @router.get("/admin/events", response_model=List[schemas.EventOut], dependencies=[Depends(super_admin_only)])
 def list_events_admin(request: Request, db: Session = Depends(get_db)):
@@ -229,7 +245,7 @@ def list_events_admin(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/admin/events/{event_id}", response_model=schemas.EventOut, dependencies=[Depends(super_admin_only)])
 def get_event_admin(event_id: int, request: Request, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+    event = repository.get_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
@@ -257,7 +273,7 @@ def get_event_admin(event_id: int, request: Request, db: Session = Depends(get_d
 async def update_event(
     event_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     name: str | None = Form(None),
     venue_id: int | None = Form(None),
     desktop_image: UploadFile | None = File(None),
@@ -268,7 +284,7 @@ async def update_event(
     category: str | None = Form(None),
     days: str | None = Form(None)
 ):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+    event = await db.get(models.Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
@@ -319,7 +335,7 @@ async def update_event(
             raise HTTPException(400, "Invalid days JSON")
 
         # Delete existing days
-        db.query(models.EventDay).filter(models.EventDay.event_id == event.id).delete()
+        await db.execute(delete(models.EventDay).where(models.EventDay.event_id == event.id))
         
         # Add new days
         for d in days_data:
@@ -340,8 +356,9 @@ async def update_event(
                 note=d.get("note")
             ))
 
-    db.commit()
-    db.refresh(event)
+    await db.commit()
+    await db.refresh(event)
+    await db.refresh(event, attribute_names=["days"])
 
     # Generate image URLs
     desktop_url = gcs_storage.get_public_url(event.desktop_image)
@@ -371,7 +388,7 @@ async def update_event(
 
 @router.delete("/admin/events/{event_id}", status_code=204, dependencies=[Depends(super_admin_only)])
 def delete_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+    event = repository.get_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
@@ -398,16 +415,16 @@ def delete_event(event_id: int, db: Session = Depends(get_db)):
 async def create_event_day_routes(
     day_id: int,
     data: schemas.EventDayRoutesUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Bulk create/update routes for an EventDay.
     Clears existing routes for that day and recreates them based on the payload.
     """
-    day = db.query(models.EventDay).filter(models.EventDay.id == day_id).first()
+    day = await db.get(models.EventDay, day_id)
     if not day:
         # Fallback: check if we can find it via data.event_day_id if URL ID is generic/placeholder
-        day = db.query(models.EventDay).filter(models.EventDay.id == data.event_day_id).first()
+        day = await db.get(models.EventDay, data.event_day_id)
         if not day:
             raise HTTPException(status_code=404, detail="Event day not found")
 
@@ -415,31 +432,16 @@ async def create_event_day_routes(
     if data.event_date:
         day.event_date = data.event_date
 
-    # 1. Cleanup old routes and nodes for this day
-    for route in day.routes:
-        old_nodes = db.query(models.EventStopNode).filter_by(route_id=route.id).all()
-        for node in old_nodes:
-            cleanup_node_references(db, node, route.id)
-            node.next_stop_id = None
-            db.add(node)
-        db.flush()
-        db.query(models.EventStopNode).filter_by(route_id=route.id).delete()
-    
-    db.query(models.EventRoute).filter_by(event_day_id=day.id).delete()
-    db.flush()
+    await db.run_sync(replace_event_day_routes, day, data.routes)
+    await db.commit()
 
-    # 2. Create new routes from the list
-    for r_data in data.routes:
-        create_event_route_logic(db, day.id, r_data)
+    # Attach full chains for response (lazy loads, so on the sync side)
+    def build_response(session: Session):
+        session.refresh(day)
+        load_full_stop_nodes(session, day.routes)
+        return schemas.EventDayOut.model_validate(day)
 
-    db.commit()
-    db.refresh(day)
-
-    # Attach full chains for response
-    for route in day.routes:
-        attach_full_stop_nodes(route)
-
-    return day
+    return await db.run_sync(build_response)
 
 @router.get("/admin/event-days/{day_id}/routes", response_model=List[schemas.EventRouteOut], dependencies=[Depends(super_admin_only)])
 def get_event_day_routes(day_id: int, db: Session = Depends(get_db)):
@@ -447,10 +449,7 @@ def get_event_day_routes(day_id: int, db: Session = Depends(get_db)):
     if not day:
         raise HTTPException(status_code=404, detail="Event day not found")
     
-    for route in day.routes:
-        attach_full_stop_nodes(route)
-        
-    return day.routes
+    return load_full_stop_nodes(db, day.routes)
 
 # --- GENERAL EVENT ROUTE CRUD ---
 
@@ -467,7 +466,7 @@ def create_event_route(
     route = create_event_route_logic(db, day_id, data)
     db.commit()
     db.refresh(route)
-    return attach_full_stop_nodes(route)
+    return load_full_stop_nodes(db, [route])[0]
 
 
 @router.get("/admin/event-routes/", response_model=List[schemas.EventRouteSummaryOut], dependencies=[Depends(super_admin_only)])
@@ -475,10 +474,23 @@ def list_event_routes(skip: int = 0, limit: int = 100, db: Session = Depends(get
     """
     List summary of all EventRoutes.
     """
-    routes = db.query(models.EventRoute).offset(skip).limit(limit).all()
+    # One statement: the page of routes, joined to stop counts grouped for just that page
+    page = db.query(models.EventRoute).order_by(models.EventRoute.id).offset(skip).limit(limit).subquery()
+    page_route = aliased(models.EventRoute, page)
+    counts = (
+        select(models.EventStopNode.route_id, func.count().label("stop_count"))
+        .where(models.EventStopNode.route_id.in_(select(page.c.id)))
+        .group_by(models.EventStopNode.route_id)
+        .subquery()
+    )
+    rows = (
+        db.query(page_route, func.coalesce(counts.c.stop_count, 0))
+        .outerjoin(counts, counts.c.route_id == page_route.id)
+        .order_by(page_route.id)
+        .all()
+    )
     result = []
-    for route in routes:
-        stop_count = db.query(models.EventStopNode).filter_by(route_id=route.id).count()
+    for route, stop_count in rows:
         result.append({
             "id": route.id,
             "name": route.name,
@@ -498,9 +510,15 @@ def list_all_event_routes(db: Session = Depends(get_db)):
     List all EventRoutes with full detail.
     """
     routes = db.query(models.EventRoute).all()
-    for route in routes:
-        attach_full_stop_nodes(route)
-    return routes
+    return load_full_stop_nodes(db, routes)
+
+
+@router.get("/admin/event-routes/by-stops", response_model=List[schemas.EventRoutePathOut], dependencies=[Depends(super_admin_only)])
+def list_event_routes_by_stops(stop_ids: List[int] = Query(...), db: Session = Depends(get_read_db)):
+    """
+    EventRoutes that pass all the given stops, in the given order.
+    """
+    return routes_passing(db, models.EventRoute, stop_ids)
 
 
 @router.get("/admin/event-routes/{route_id}", response_model=schemas.EventRouteOut, dependencies=[Depends(super_admin_only)])
@@ -512,7 +530,7 @@ def get_event_route(route_id: int, db: Session = Depends(get_db)):
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
     
-    return attach_full_stop_nodes(route)
+    return load_full_stop_nodes(db, [route])[0]
 
 
 @router.put("/admin/event-routes/{day_id}", response_model=schemas.EventDayOut, dependencies=[Depends(super_admin_only)])
@@ -529,29 +547,13 @@ def update_event_day_routes_bulk(
     if not day:
         raise HTTPException(status_code=404, detail="Event day not found")
 
-    # 1. Cleanup old routes and nodes for this day
-    for route in day.routes:
-        old_nodes = db.query(models.EventStopNode).filter_by(route_id=route.id).all()
-        for node in old_nodes:
-            cleanup_node_references(db, node, route.id)
-            node.next_stop_id = None
-            db.add(node)
-        db.flush()
-        db.query(models.EventStopNode).filter_by(route_id=route.id).delete()
-    
-    db.query(models.EventRoute).filter_by(event_day_id=day.id).delete()
-    db.flush()
-
-    # 2. Create new routes from the list
-    for r_data in data.routes:
-        create_event_route_logic(db, day.id, r_data)
+    replace_event_day_routes(db, day, data.routes)
 
     db.commit()
     db.refresh(day)
 
     # Attach full chains for response
-    for route in day.routes:
-        attach_full_stop_nodes(route)
+    load_full_stop_nodes(db, day.routes)
 
     return day
 
@@ -580,7 +582,7 @@ def delete_event_day_routes_bulk(day_id: int, db: Session = Depends(get_db)):
 
 # PUBLIC ROUTES (no dependencies or different policy)
 @router.get("/", response_model=List[schemas.EventOut])
-def list_events_public(request: Request, db: Session = Depends(get_db)):
+def list_events_public(request: Request, db: Session = Depends(get_read_db)):
     events = db.query(models.Event).filter(
         models.Event.is_active == True,
         models.Event.status != models.EventStatus.HIDDEN
@@ -609,13 +611,21 @@ def list_events_public(request: Request, db: Session = Depends(get_db)):
     return event_list
 
 
+@router.get("/days/{day_id}/journeys", response_model=List[schemas.JourneyOut])
+def search_journeys(day_id: int, from_stop: int, to_stop: int):
+    """
+    Routes of an event day that pick up at from_stop and reach to_stop later on, with the
+    pickup / drop-off price and time. Served from the day's in-memory reachability index.
+    """
+    index = journey_index.get(day_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Event day not found")
+    return index.search(from_stop, to_stop)
+
+
 @router.get("/{event_id}", response_model=schemas.EventOut)
-def get_event_public(event_id: int, request: Request, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(
-        models.Event.id == event_id,
-        models.Event.is_active == True,
-        models.Event.status != models.EventStatus.HIDDEN
-    ).first()
+def get_event_public(event_id: int, request: Request, db: Session = Depends(get_read_db)):
+    event = repository.get_public_event(db, event_id)
     
     if not event:
         raise HTTPException(status_code=404, detail="Event not found or inactive")
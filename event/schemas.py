@@ -210,4 +210,36 @@ class EventRouteSummaryOut(BaseModel):
     stop_count: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class EventRoutePathOut(BaseModel):
+    id: int
+    name: str
+    event_day_id: int
+    group_id: Optional[int] = None
+    start_location: str
+    destination: str
+    is_active: bool
+    stop_ids: List[int] = []  # ordered, full chain
+
+    class Config:
+        from_attributes = True
+
+
+# --- Journey Search Schemas ---
+class JourneyStopOut(BaseModel):
+    node_id: int
+    stop_id: int
+    price: float
+    pickup_time: Optional[time] = None
+
+
+class JourneyOut(BaseModel):
+    route_id: int
+    route_name: str
+    group_id: Optional[int] = None
+    start_location: str
+    destination: str
+    pickup: JourneyStopOut
+    dropoff: JourneyStopOut
+    stops_between: int
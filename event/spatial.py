@@ -0,0 +1,57 @@
+"""
+In-memory map clusters over the venues table, and the pre-serialized venues GeoJSON
+collection (see travel.spatial for stops). Snapshots (core.app.snapshot), dropped when this
+process commits a Venue write.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from core.app.snapshot import SnapshotCache, Payload
+from utils.geo import ClusterIndex, cluster_features
+from .models import Venue
+
+
+class VenueIndex:
+    def __init__(self, rows):
+        self.points = [
+            {"id": row.id, "name": row.name, "location": row.location, "lat": row.lat, "lng": row.lng}
+            for row in rows
+        ]
+        self.clusters = ClusterIndex([v["lat"] for v in self.points], [v["lng"] for v in self.points])
+
+    def cluster_geojson(self, bbox, zoom: int) -> dict:
+        return {"type": "FeatureCollection", "features": cluster_features(self.clusters, self.points, bbox, zoom)}
+
+
+def load_venue_index(db: Session, key=None) -> VenueIndex:
+    return VenueIndex(db.query(Venue.id, Venue.name, Venue.location, Venue.lat, Venue.lng).all())
+
+
+venue_index = SnapshotCache("venues", load_venue_index)
+
+
+def load_venue_geojson(db: Session, key=None) -> Payload:
+    venues = db.query(Venue).order_by(Venue.id).all()
+    return Payload({"type": "FeatureCollection", "features": [venue.to_geojson() for venue in venues]})
+
+
+venue_geojson = SnapshotCache("venues_geojson", load_venue_geojson)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_venue_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Venue):
+            session.info["venues_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_venue_index(session):
+    if session.info.pop("venues_changed", False):
+        venue_index.invalidate()
+        venue_geojson.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_venue_writes(session):
+    session.info.pop("venues_changed", None)
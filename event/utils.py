@@ -2,6 +2,12 @@ from sqlalchemy.orm import Session
 from typing import List, Tuple, Optional
 from .models import EventRoute, EventStopNode
 from . import models
+from collections import defaultdict
+from sqlalchemy.orm.attributes import set_committed_value
+from travel.utils import load_stop_node_graph
+from travel.stop_paths import register_stop_paths
+
+register_stop_paths(EventRoute, EventStopNode)
 
 def build_previous_chain(node: EventStopNode):
     """
@@ -166,6 +172,30 @@ def attach_full_stop_nodes(route: EventRoute):
 
     return route
 
+def load_full_stop_nodes(db: Session, routes: list[EventRoute]) -> list[EventRoute]:
+    """
+    Same result as attach_full_stop_nodes for each route, with the whole node graph
+    fetched in one query (see travel.utils.load_stop_node_graph).
+    """
+    nodes = load_stop_node_graph(db, EventStopNode, [route.id for route in routes])
+
+    own_nodes = defaultdict(list)
+    for node in nodes:
+        own_nodes[node.route_id].append(node)
+
+    for route in routes:
+        all_nodes = []
+        visited = set()
+        for node in own_nodes[route.id]:
+            if not node.previous_stop_node:  # starting nodes for this route
+                all_nodes.extend(build_full_route_from_node(node, visited))
+
+        # Deduplicate nodes (branches safe); committed so nothing is flushed back
+        unique_nodes = {node.id: node for node in all_nodes}.values()
+        set_committed_value(route, "stop_nodes", list(unique_nodes))
+
+    return routes
+
 def create_event_route_logic(
     db: Session,
     day_id: int,
@@ -223,3 +253,30 @@ def create_event_route_logic(
 
     db.flush()
     return route
+
+def replace_event_day_routes(
+    db: Session,
+    day: models.EventDay,
+    routes_data: list
+) -> models.EventDay:
+    """
+    Clears existing routes (and their nodes) for an EventDay and recreates them from the payload.
+    """
+    # 1. Cleanup old routes and nodes for this day
+    for route in day.routes:
+        old_nodes = db.query(models.EventStopNode).filter_by(route_id=route.id).all()
+        for node in old_nodes:
+            cleanup_node_references(db, node, route.id)
+            node.next_stop_id = None
+            db.add(node)
+        db.flush()
+        db.query(models.EventStopNode).filter_by(route_id=route.id).delete()
+
+    db.query(models.EventRoute).filter_by(event_day_id=day.id).delete()
+    db.flush()
+
+    # 2. Create new routes from the list
+    for r_data in routes_data:
+        create_event_route_logic(db, day.id, r_data)
+
+    return day
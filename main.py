@@ -36,5 +36,5 @@ if __name__ == "__main__":
             host=settings.SERVER_HOST if settings.IS_PROD else '0.0.0.0',
             port=settings.PORT,
             reload=settings.IS_DEV,
-            workers=settings.WORKERS if settings.IS_PROD else None
+            workers=settings.SERVER_WORKERS if settings.IS_PROD else None
         )
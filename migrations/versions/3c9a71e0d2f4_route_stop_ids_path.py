@@ -0,0 +1,64 @@
+"""route stop_ids path
+
+Revision ID: 3c9a71e0d2f4
+Revises: b52d0c8e41a7
+Create Date: 2026-10-16 14:22:51.730914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a71e0d2f4'
+down_revision: Union[str, Sequence[str], None] = 'b52d0c8e41a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same walk as travel.stop_paths.refresh_stop_paths, for every route
+BACKFILL = """
+WITH RECURSIVE stop_walk(route_id, head_id, node_id, next_stop_id, stop_id, position) AS (
+    SELECT n.route_id, n.id, n.id, n.next_stop_id, n.stop_id, 1
+    FROM {nodes} n
+    WHERE NOT EXISTS (SELECT 1 FROM {nodes} p WHERE p.next_stop_id = n.id AND p.route_id = n.route_id)
+    UNION ALL
+    SELECT w.route_id, w.head_id, n.id, n.next_stop_id, n.stop_id, w.position + 1
+    FROM stop_walk w JOIN {nodes} n ON n.id = w.next_stop_id
+    WHERE w.position < 1000
+)
+UPDATE {routes} r SET stop_ids = p.stop_ids
+FROM (
+    SELECT route_id, array_agg(stop_id ORDER BY head_id, position) AS stop_ids
+    FROM stop_walk GROUP BY route_id
+) p
+WHERE p.route_id = r.id
+"""
+
+TABLES = [("routestemplate", "stop_nodes"), ("event_routes", "event_stop_nodes")]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # routestemplate/stop_nodes may only exist via create_all, hence the to_regclass checks
+    for routes, nodes in TABLES:
+        op.execute(f"""
+            DO $$ BEGIN
+                IF to_regclass('{routes}') IS NOT NULL THEN
+                    ALTER TABLE {routes} ADD COLUMN IF NOT EXISTS stop_ids INTEGER[] NOT NULL DEFAULT '{{}}';
+                    CREATE INDEX IF NOT EXISTS ix_{routes}_stop_ids ON {routes} USING gin (stop_ids);
+                    IF to_regclass('{nodes}') IS NOT NULL THEN
+                        {BACKFILL.format(routes=routes, nodes=nodes)};
+                    END IF;
+                END IF;
+            END $$
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for routes, _ in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{routes}_stop_ids")
+        op.execute(f"ALTER TABLE IF EXISTS {routes} DROP COLUMN IF EXISTS stop_ids")
@@ -0,0 +1,66 @@
+"""route graph version
+
+Revision ID: 6b0d93c2e7a4
+Revises: e5a1f08c6b3d
+Create Date: 2026-10-17 10:12:37.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b0d93c2e7a4'
+down_revision: Union[str, Sequence[str], None] = 'e5a1f08c6b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Change counter the in-memory route graph index checks before each merge lookup.
+    # On a fresh database stop_nodes doesn't exist yet; create_all adds the trigger then.
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS route_graph_version (
+            id integer PRIMARY KEY,
+            version bigint NOT NULL DEFAULT 0,
+            last_txid bigint
+        )
+    """)
+    op.execute("INSERT INTO route_graph_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_route_graph_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE route_graph_version
+            SET version = version + 1, last_txid = txid_current()
+            WHERE id = 1 AND last_txid IS DISTINCT FROM txid_current();
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('stop_nodes') IS NOT NULL THEN
+                DROP TRIGGER IF EXISTS stop_nodes_graph_version ON stop_nodes;
+                CREATE TRIGGER stop_nodes_graph_version
+                AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF next_stop_id, stop_id, route_id ON stop_nodes
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_route_graph_version();
+            END IF;
+        END $$
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('stop_nodes') IS NOT NULL THEN
+                DROP TRIGGER IF EXISTS stop_nodes_graph_version ON stop_nodes;
+            END IF;
+        END $$
+    """)
+    op.execute("DROP FUNCTION IF EXISTS bump_route_graph_version()")
+    op.execute("DROP TABLE IF EXISTS route_graph_version")
@@ -0,0 +1,31 @@
+"""index stop node next_stop_id
+
+Revision ID: 7f13e129852f
+Revises: 00470f37531d
+Create Date: 2026-10-16 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f13e129852f'
+down_revision: Union[str, Sequence[str], None] = '00470f37531d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Predecessor lookups (WHERE next_stop_id = ?) drive the recursive chain loader
+    op.create_index(op.f('ix_stop_nodes_next_stop_id'), 'stop_nodes', ['next_stop_id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_event_stop_nodes_next_stop_id'), 'event_stop_nodes', ['next_stop_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_event_stop_nodes_next_stop_id'), table_name='event_stop_nodes', if_exists=True)
+    op.drop_index(op.f('ix_stop_nodes_next_stop_id'), table_name='stop_nodes', if_exists=True)
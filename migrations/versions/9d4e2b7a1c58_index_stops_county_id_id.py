@@ -0,0 +1,35 @@
+"""index stops county_id id
+
+Revision ID: 9d4e2b7a1c58
+Revises: 3c9a71e0d2f4
+Create Date: 2026-10-16 16:05:12.408317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e2b7a1c58'
+down_revision: Union[str, Sequence[str], None] = '3c9a71e0d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pages of the stop catalog by county; stops may only exist via create_all
+    op.execute("""
+        DO $$ BEGIN
+            IF to_regclass('stops') IS NOT NULL THEN
+                CREATE INDEX IF NOT EXISTS ix_stops_county_id_id ON stops (county_id, id);
+            END IF;
+        END $$
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_stops_county_id_id")
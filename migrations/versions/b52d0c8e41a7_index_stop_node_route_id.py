@@ -0,0 +1,31 @@
+"""index stop node route_id
+
+Revision ID: b52d0c8e41a7
+Revises: 7f13e129852f
+Create Date: 2026-10-16 13:40:08.215633
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52d0c8e41a7'
+down_revision: Union[str, Sequence[str], None] = '7f13e129852f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per-route node lookups and the grouped stop counts of the route summary listings
+    op.create_index(op.f('ix_stop_nodes_route_id'), 'stop_nodes', ['route_id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_event_stop_nodes_route_id'), 'event_stop_nodes', ['route_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_event_stop_nodes_route_id'), table_name='event_stop_nodes', if_exists=True)
+    op.drop_index(op.f('ix_stop_nodes_route_id'), table_name='stop_nodes', if_exists=True)
@@ -0,0 +1,43 @@
+"""unique stop name
+
+Revision ID: e5a1f08c6b3d
+Revises: 9d4e2b7a1c58
+Create Date: 2026-10-16 17:31:44.902116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1f08c6b3d'
+down_revision: Union[str, Sequence[str], None] = '9d4e2b7a1c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Conflict target of the bulk stop import. Duplicate names have to be renamed by hand
+    # first (route nodes point at the stop rows), so fail with the list instead of guessing.
+    op.execute("""
+        DO $$
+        DECLARE duplicates text;
+        BEGIN
+            IF to_regclass('stops') IS NOT NULL THEN
+                SELECT string_agg(name, ', ') INTO duplicates
+                FROM (SELECT name FROM stops GROUP BY name HAVING count(*) > 1) d;
+                IF duplicates IS NOT NULL THEN
+                    RAISE EXCEPTION 'Duplicate stop names, rename them before upgrading: %', duplicates;
+                END IF;
+                CREATE UNIQUE INDEX IF NOT EXISTS ix_stops_name ON stops (name);
+            END IF;
+        END $$
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_stops_name")
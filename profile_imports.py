@@ -0,0 +1,17 @@
+"""
+Cold start helpers.
+
+    python profile_imports.py              # -X importtime breakdown for core.app
+    python profile_imports.py event.routes # ...or any other module
+    python profile_imports.py --precompile # compile the project's bytecode (what the Dockerfiles do)
+"""
+import sys
+import core.app  # load the app package before its helpers (circular import otherwise)
+from core.config.helper import import_time_report, precompile_bytecode
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--precompile" in args:
+        sys.exit(0 if precompile_bytecode() else 1)
+    import_time_report(args[0] if args else "core.app")
@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 from auth.routes import router as auth_router
+from .admin import router as admin_router
+from .tiles import router as tiles_router
 router = APIRouter()
 
 
-router.include_router(auth_router,prefix='/auth', tags=["Authentication"])
\ No newline at end of file
+router.include_router(auth_router,prefix='/auth', tags=["Authentication"])
+router.include_router(admin_router,prefix='/admin', tags=["Admin"])
+router.include_router(tiles_router,prefix='/tiles', tags=["Tiles"])
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from auth.utils import super_admin_only
+from core.app.database import pool_status, pool_stats, pool_budget, check_schema
+
+router = APIRouter(dependencies=[Depends(super_admin_only)])
+
+
+@router.get("/db-pool")
+def read_db_pool():
+    """
+    Live connection pool stats for the worker that serves the request.
+    Each worker has its own pools, so repeat the call to sample the others.
+    """
+    return {
+        "budget": pool_budget,
+        "pools": pool_status(),
+        "events": dict(pool_stats),
+    }
+
+
+@router.post("/schema-check")
+def run_schema_check():
+    """
+    The slow schema checks skipped at startup: alembic revision vs head,
+    and create_all for any model tables missing from the database.
+    """
+    return check_schema()
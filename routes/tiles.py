@@ -0,0 +1,49 @@
+"""
+Mapbox Vector Tile endpoints for the stop and venue maps, served from travel.tiles.
+
+Stop tiles are admin-only, like /travel/stops/geojson and /travel/stops/clusters, and sent
+as private; venue tiles are public.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Response
+from core.app.env import settings
+from auth.utils import super_admin_only
+from travel.tiles import MAX_ZOOM, tile_cache
+
+router = APIRouter()
+
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+def _tile_response(layer: str, z: int, x: int, y: int, cache_control: str) -> Response:
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Tile out of range")
+
+    tile = tile_cache.get((layer, z, x, y))
+    headers = {"Cache-Control": f"{cache_control}, max-age={settings.SNAPSHOT_TTL_SECONDS}"}
+    if not tile:
+        return Response(status_code=204, headers=headers)
+    return Response(content=tile, media_type=MEDIA_TYPE, headers=headers)
+
+
+@router.get("/stops/{z}/{x}/{y}.mvt", dependencies=[Depends(super_admin_only)])
+def read_stop_tile(z: int, x: int, y: int):
+    """
+    Stops as a Mapbox Vector Tile (one layer, "stops"). Admin only.
+    Clusters carry cluster / cluster_id / point_count; single points carry the stop's fields.
+    """
+    return _tile_response("stops", z, x, y, "private")
+
+
+@router.get("/venues/{z}/{x}/{y}.mvt")
+def read_venue_tile(z: int, x: int, y: int):
+    """
+    Venues as a Mapbox Vector Tile (one layer, "venues").
+    Clusters carry cluster / cluster_id / point_count; single points carry the venue's fields.
+    """
+    return _tile_response("venues", z, x, y, "public")
+
+
+@router.get("/{layer}/{z}/{x}/{y}.mvt", include_in_schema=False)
+def read_unknown_tile(layer: str, z: int, x: int, y: int):
+    # Otherwise the SPA catch-all would answer with index.html
+    raise HTTPException(status_code=404, detail=f"Unknown tile layer '{layer}'")
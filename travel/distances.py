@@ -0,0 +1,102 @@
+"""
+Distance / travel-time legs along stop sequences, for admin route building.
+
+Only consecutive legs are ever needed, so each request loads just the coordinates of its
+own points (one query per point kind) and computes the great-circle legs with NumPy;
+nothing is precomputed over the whole stop / venue catalog. Travel times are derived with
+TRAVEL_ROAD_FACTOR and TRAVEL_AVG_SPEED_KMH.
+"""
+from itertools import groupby
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from core.app.env import settings
+from utils.geo import haversine_legs
+from event.models import Venue
+from .models import Stop, StopNode
+from .stop_paths import stop_path_walk
+
+
+def minutes(km):
+    """Estimated driving minutes for straight-line km (scalar or array)"""
+    return km * settings.TRAVEL_ROAD_FACTOR / settings.TRAVEL_AVG_SPEED_KMH * 60
+
+
+def _coordinates(db: Session, points: set[tuple[str, int]]) -> dict[tuple[str, int], tuple[float, float]]:
+    """(lat, lng) of each point; 404 naming any that don't exist"""
+    found = {}
+    for kind, model in (("stop", Stop), ("venue", Venue)):
+        ids = {point_id for point_kind, point_id in points if point_kind == kind}
+        if ids:
+            rows = db.execute(select(model.id, model.lat, model.lng).where(model.id.in_(ids)))
+            found.update({(kind, point_id): (lat, lng) for point_id, lat, lng in rows})
+    missing = sorted(p for p in points if p not in found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Unknown {', '.join(f'{kind} {point_id}' for kind, point_id in missing)}")
+    return found
+
+
+def _legs(db: Session, paths: list[list[tuple[str, int]]]) -> dict:
+    """Legs along each path (no leg between one path's end and the next path's start)"""
+    coordinates = _coordinates(db, {p for path in paths for p in path})
+    legs, total_km, total_minutes = [], 0.0, 0.0
+    for points in paths:
+        if len(points) < 2:
+            continue
+        lats, lngs = np.array([coordinates[p] for p in points], dtype=np.float64).T
+        km = haversine_legs(lats, lngs)
+        leg_minutes = minutes(km)
+        legs += [
+            {
+                "from_type": a[0], "from_id": a[1],
+                "to_type": b[0], "to_id": b[1],
+                "distance_km": round(float(d), 3),
+                "minutes": round(float(m), 1),
+            }
+            for a, b, d, m in zip(points, points[1:], km, leg_minutes)
+        ]
+        total_km += float(km.sum())
+        total_minutes += float(leg_minutes.sum())
+    return {
+        "legs": legs,
+        "total_distance_km": round(total_km, 3),
+        "total_minutes": round(total_minutes, 1),
+    }
+
+
+def route_legs(db: Session, stop_ids: list[int], venue_id: int | None = None) -> dict:
+    """Per-leg and total distance / time along stop_ids (then on to the venue, if given)"""
+    points = [("stop", stop_id) for stop_id in stop_ids]
+    if venue_id is not None:
+        points.append(("venue", venue_id))
+    return _legs(db, [points])
+
+
+def template_legs(db: Session, route_id: int, venue_id: int | None = None) -> dict:
+    """
+    Legs of a saved route, walked from each of its heads along the node chain. A branch
+    stops at the first node an earlier branch already covered, so shared legs count once
+    and no leg joins one branch's end to the next branch's start.
+    """
+    walk = stop_path_walk(StopNode, [route_id])
+    rows = db.execute(
+        select(walk.c.head_id, walk.c.node_id, walk.c.stop_id).order_by(walk.c.head_id, walk.c.position)
+    ).all()
+
+    paths, covered = [], set()
+    for _, branch in groupby(rows, key=lambda row: row[0]):
+        points = []
+        for _, node_id, stop_id in branch:
+            points.append(("stop", stop_id))
+            if node_id in covered:
+                break
+            covered.add(node_id)
+        else:
+            # Ran to the end of the chain: the venue leg goes here
+            if venue_id is not None:
+                points.append(("venue", venue_id))
+        paths.append(points)
+    if not paths and venue_id is not None:
+        _coordinates(db, {("venue", venue_id)})  # still 404 an unknown venue
+    return _legs(db, paths)
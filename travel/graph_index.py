@@ -0,0 +1,305 @@
+"""
+Per-process index of the template StopNode graph, so route create/update can find merge
+points in memory instead of querying and lazy-walking stop_nodes for every candidate.
+
+The index mirrors committed rows: it is built from one bulk query and kept current with the
+StopNode writes of this process's sessions (applied on commit). Before use it reads the
+route_graph_version row (a primary-key lookup), which a trigger bumps once per transaction
+that changes the graph, from any worker or raw SQL; if that isn't the version the index
+last saw, it is rebuilt. A commit of this process moves the index to its own version only
+if nothing else committed in between.
+
+The maps are plain dicts and sets rather than packed arrays: they are edited per node on
+every commit (inserts, deletes, relinks, trie re-placement), which arrays would turn into
+whole-array copies, and node ids are sparse after deletes.
+
+Merge detection uses a reversed trie of stop ids: every node sits at the trie position
+spelling its downstream stop sequence backwards (last stop first). Nodes whose chain equals
+a suffix of a new route are then found by walking the new route backwards, O(route length).
+"""
+import threading
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from core.app.database import engine, SessionLocal
+from .models import RouteGraphVersion, StopNode
+
+
+class _TrieNode:
+    __slots__ = ("parent", "stop_id", "depth", "children", "nodes")
+
+    def __init__(self, parent=None, stop_id=None):
+        self.parent = parent
+        self.stop_id = stop_id
+        self.depth = parent.depth + 1 if parent else 0
+        self.children: dict[int, "_TrieNode"] = {}
+        self.nodes: set[int] = set()  # stop node ids whose downstream sequence ends here
+
+    def child(self, stop_id: int) -> "_TrieNode":
+        node = self.children.get(stop_id)
+        if node is None:
+            node = self.children[stop_id] = _TrieNode(self, stop_id)
+        return node
+
+
+class RouteGraphIndex:
+    def __init__(self):
+        self.next_of: dict[int, int | None] = {}   # node id -> next node id
+        self.stop_of: dict[int, int] = {}          # node id -> stop id
+        self.route_of: dict[int, int] = {}         # node id -> route id
+        self.prev_of: dict[int, set[int]] = {}     # node id -> ids of nodes linking to it
+        self.route_nodes: dict[int, set[int]] = {} # route id -> node ids
+        self.trie = _TrieNode()
+        self.trie_of: dict[int, _TrieNode] = {}    # node id -> trie position
+        self.built = False
+        self.version: int | None = None  # route_graph_version the index reflects
+        self._lock = threading.RLock()
+
+    # -----------------------------
+    # Build / keep in sync
+    # -----------------------------
+    def rebuild(self, conn=None):
+        if conn is None:
+            with engine.connect() as conn:
+                return self.rebuild(conn)
+        # Version first: a commit landing between the two reads only causes another rebuild
+        version = conn.execute(select(RouteGraphVersion.version)).scalar()
+        rows = conn.execute(select(StopNode.id, StopNode.next_stop_id, StopNode.stop_id, StopNode.route_id)).all()
+        self.load(rows, version)
+        print(f"🗺️ Route graph index built: {len(rows)} stop nodes")
+
+    def load(self, rows, version: int | None = None):
+        """Replace the index with (id, next_stop_id, stop_id, route_id) rows"""
+        with self._lock:
+            self.next_of.clear()
+            self.stop_of.clear()
+            self.route_of.clear()
+            self.prev_of.clear()
+            self.route_nodes.clear()
+            self.trie = _TrieNode()
+            self.trie_of.clear()
+            self.version = version
+            for node_id, next_id, stop_id, route_id in rows:
+                self._set(node_id, next_id, stop_id, route_id)
+            self._place(list(self.stop_of))
+            self.built = True
+
+    def ensure_fresh(self):
+        """Rebuild if the committed graph version isn't the one the index reflects"""
+        with engine.connect() as conn:
+            version = conn.execute(select(RouteGraphVersion.version)).scalar()
+            with self._lock:
+                # No version row (trigger not installed): nothing to compare, always reload
+                if not self.built or version is None or version != self.version:
+                    self.rebuild(conn)
+
+    def apply(self, upserts: dict, deleted: set[int], deleted_routes: set[int], version: int | None = None):
+        """Apply committed StopNode writes; version is the one that commit produced, if it bumped it"""
+        with self._lock:
+            if not self.built:
+                return
+            if version is not None:
+                if self.version != version - 1:
+                    # Another transaction committed since the index was synced: reload instead
+                    self.built = False
+                    return
+                self.version = version
+            changed = set()
+            for route_id in deleted_routes:
+                for node_id in list(self.route_nodes.get(route_id, ())):
+                    changed |= self._unset(node_id)
+            for node_id in deleted:
+                changed |= self._unset(node_id)
+            for node_id, (next_id, stop_id, route_id) in upserts.items():
+                changed |= self._unset(node_id)
+                self._set(node_id, next_id, stop_id, route_id)
+                changed.add(node_id)
+
+            # A node's trie position depends on everything downstream, so re-place whatever
+            # sits upstream of a change too
+            self._place(self._upstream({n for n in changed if n in self.stop_of}))
+
+    def _set(self, node_id, next_id, stop_id, route_id):
+        self.next_of[node_id] = next_id
+        self.stop_of[node_id] = stop_id
+        self.route_of[node_id] = route_id
+        self.prev_of.setdefault(node_id, set())
+        if next_id is not None:
+            self.prev_of.setdefault(next_id, set()).add(node_id)
+        self.route_nodes.setdefault(route_id, set()).add(node_id)
+
+    def _unset(self, node_id) -> set[int]:
+        """Drop a node; returns the nodes that linked to it (their position changes)"""
+        if node_id not in self.stop_of:
+            return set()
+        next_id = self.next_of.pop(node_id)
+        self.stop_of.pop(node_id)
+        route_id = self.route_of.pop(node_id)
+        if next_id is not None and next_id in self.prev_of:
+            self.prev_of[next_id].discard(node_id)
+        self.route_nodes[route_id].discard(node_id)
+        if not self.route_nodes[route_id]:
+            del self.route_nodes[route_id]
+        self._untrie(node_id)
+        prevs = self.prev_of.pop(node_id, set())
+        if prevs:
+            self.prev_of[node_id] = prevs  # still linked to; the links go when those nodes change
+        return set(prevs)
+
+    def _upstream(self, node_ids: set[int]) -> list[int]:
+        seen = set(node_ids)
+        stack = list(node_ids)
+        while stack:
+            for prev in self.prev_of.get(stack.pop(), ()):
+                if prev not in seen and prev in self.stop_of:
+                    seen.add(prev)
+                    stack.append(prev)
+        return list(seen)
+
+    def _untrie(self, node_id):
+        position = self.trie_of.pop(node_id, None)
+        if position is None:
+            return
+        position.nodes.discard(node_id)
+        # prune branches nothing ends in any more
+        while position.parent is not None and not position.nodes and not position.children:
+            del position.parent.children[position.stop_id]
+            position = position.parent
+
+    def _place(self, node_ids: list[int]):
+        """(Re)compute trie positions; a node's position is its next node's plus its own stop"""
+        for node_id in node_ids:
+            self._untrie(node_id)
+
+        for node_id in node_ids:
+            # walk down to a node that is already placed (or the end of the chain)...
+            path = []
+            walked = set()
+            current = node_id
+            while current is not None and current in self.stop_of and current not in self.trie_of:
+                if current in walked:
+                    break  # cycle guard
+                walked.add(current)
+                path.append(current)
+                current = self.next_of.get(current)
+            position = self.trie_of.get(current, self.trie) if current is not None else self.trie
+
+            # ...then place the walked nodes on the way back up
+            for n in reversed(path):
+                position = position.child(self.stop_of[n])
+                position.nodes.add(n)
+                self.trie_of[n] = position
+
+    # -----------------------------
+    # Matching
+    # -----------------------------
+    def find_matching_subsequence(
+        self,
+        target_stop_ids: list[int],
+        exclude_route_id: int | None = None
+    ) -> tuple[int, list[int]] | None:
+        """
+        The first (earliest) suffix of the new route, at least two stops long, that an
+        existing chain matches exactly to its end, as (start index, matched node ids).
+        Ties go to the lowest node id.
+
+        Nodes of exclude_route_id are skipped, and so is every chain running into them:
+        update_route keeps the route's nodes, so merging into such a chain would loop back.
+        Route heads (nodes nothing links to) are skipped too: a route is displayed from its
+        heads, so linking into one would hide it; the match then starts one stop later.
+        """
+        with self._lock:
+            excluded = set(self.route_nodes.get(exclude_route_id, ())) if exclude_route_id else set()
+            skipped = set(self._upstream(excluded)) if excluded else set()
+
+            path = []
+            position = self.trie
+            for stop_id in reversed(target_stop_ids):
+                position = position.children.get(stop_id)
+                if position is None:
+                    break
+                path.append(position)
+
+            # Longest matching suffix first
+            for depth in range(len(path), 1, -1):
+                candidates = [n for n in path[depth - 1].nodes if n not in skipped and self.prev_of.get(n)]
+                if candidates:
+                    node_id = min(candidates)
+                    chain = [node_id]
+                    while len(chain) < depth:
+                        chain.append(self.next_of[chain[-1]])
+                    return len(target_stop_ids) - depth, chain
+
+        return None
+
+
+route_graph_index = RouteGraphIndex()
+
+
+# -----------------------------
+# Session hooks: collect StopNode writes, apply them once committed
+# -----------------------------
+def _pending(session: Session) -> dict:
+    return session.info.setdefault("route_graph_writes", {"upserts": {}, "deleted": set(), "deleted_routes": set()})
+
+
+def track_route_nodes_deleted(session: Session, route_id: int):
+    """Record a bulk (query-level) delete of a route's nodes, which flush events don't see"""
+    _pending(session)["deleted_routes"].add(route_id)
+
+
+def track_stop_nodes_deleted(session: Session, node_ids):
+    """Record a query-level delete of individual nodes"""
+    pending = _pending(session)
+    for node_id in node_ids:
+        pending["upserts"].pop(node_id, None)
+        pending["deleted"].add(node_id)
+
+
+def track_route_nodes_written(session: Session, rows):
+    """Record query-level inserts / updates, as (id, next_stop_id, stop_id, route_id) rows"""
+    upserts = _pending(session)["upserts"]
+    for node_id, next_id, stop_id, route_id in rows:
+        upserts[node_id] = (next_id, stop_id, route_id)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_stop_node_writes(session, flush_context):
+    pending = None
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, StopNode):
+            pending = pending or _pending(session)
+            pending["upserts"][obj.id] = (obj.next_stop_id, obj.stop_id, obj.route_id)
+            pending["deleted"].discard(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, StopNode):
+            pending = pending or _pending(session)
+            pending["upserts"].pop(obj.id, None)
+            pending["deleted"].add(obj.id)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _note_graph_version(session):
+    pending = session.info.get("route_graph_writes")
+    if pending is None:
+        return
+    session.flush()
+    # The trigger's row lock is held until commit, so this is the version the commit publishes
+    row = session.execute(
+        select(RouteGraphVersion.version, RouteGraphVersion.last_txid == func.txid_current())
+    ).first()
+    if row is not None and row[1]:
+        pending["version"] = row[0]
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_stop_node_writes(session):
+    pending = session.info.pop("route_graph_writes", None)
+    if pending:
+        route_graph_index.apply(
+            pending["upserts"], pending["deleted"], pending["deleted_routes"], pending.get("version")
+        )
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_stop_node_writes(session):
+    session.info.pop("route_graph_writes", None)
@@ -1,4 +1,5 @@
-from sqlalchemy import String, Integer, ForeignKey, DateTime, Float, Boolean, JSON, Table, Column
+from sqlalchemy import String, Integer, BigInteger, ForeignKey, DateTime, Float, Boolean, JSON, Table, Column, Index, DDL, event, inspect
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.app.database import Base
 from datetime import datetime
@@ -46,6 +47,13 @@ class RouteTemplate(Base):
     destination: Mapped[str] = mapped_column(String(255))
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
+    # Ordered stop ids along the full chain (own nodes + merged tail), maintained by travel.stop_paths
+    stop_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer), default=list, server_default="{}")
+
+    __table_args__ = (
+        Index("ix_routestemplate_stop_ids", "stop_ids", postgresql_using="gin"),
+    )
+
     stop_nodes: Mapped[list["StopNode"]] = relationship(
         "StopNode",
         back_populates="route",
@@ -63,14 +71,14 @@ class StopNode(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     route_id: Mapped[int] = mapped_column(
-        ForeignKey("routestemplate.id", ondelete="CASCADE")
+        ForeignKey("routestemplate.id", ondelete="CASCADE"), index=True
     )
     stop_id: Mapped[int] = mapped_column(ForeignKey("stops.id"))
     price: Mapped[float] = mapped_column(Float)
 
     # THIS MUST BE SET IN DB
     next_stop_id: Mapped[Optional[int]] = mapped_column(
-        ForeignKey("stop_nodes.id"), nullable=True
+        ForeignKey("stop_nodes.id"), nullable=True, index=True
     )
 
     route: Mapped["RouteTemplate"] = relationship(
@@ -85,7 +93,50 @@ class StopNode(Base):
         uselist=False,
         backref="previous_stop_node"
     )
-    
+
+
+class RouteGraphVersion(Base):
+    """
+    One row whose version goes up once per transaction that changes the stop_nodes graph
+    (insert / delete / next_stop_id, stop_id or route_id update), bumped by a trigger so
+    raw SQL writes count too. travel.graph_index compares it to decide when to rebuild.
+    """
+    __tablename__ = "route_graph_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+    last_txid: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+
+
+# Also in migration 6b0d93c2e7a4, for databases whose stop_nodes already exist
+ROUTE_GRAPH_VERSION_TRIGGER = """
+INSERT INTO route_graph_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+CREATE OR REPLACE FUNCTION bump_route_graph_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE route_graph_version
+    SET version = version + 1, last_txid = txid_current()
+    WHERE id = 1 AND last_txid IS DISTINCT FROM txid_current();
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS stop_nodes_graph_version ON stop_nodes;
+CREATE TRIGGER stop_nodes_graph_version
+AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF next_stop_id, stop_id, route_id ON stop_nodes
+FOR EACH STATEMENT EXECUTE FUNCTION bump_route_graph_version()
+"""
+
+_route_graph_version_trigger = DDL(ROUTE_GRAPH_VERSION_TRIGGER).execute_if(dialect="postgresql")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_route_graph_version_trigger(target, connection, tables=(), **kw):
+    """After every table exists, when create_all has just created either table (Postgres only)"""
+    names = {table.name for table in tables} & {"stop_nodes", "route_graph_version"}
+    if names and all(
+        name in names or inspect(connection).has_table(name) for name in ("stop_nodes", "route_graph_version")
+    ):
+        _route_graph_version_trigger(target, connection)
+
+
 class County(Base):
     __tablename__ = "counties"
 
@@ -109,6 +160,13 @@ class Stop(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Keyset pages of the stop catalog, optionally within one county; unique names are the
+    # conflict target of the bulk import (travel.stop_import)
+    __table_args__ = (
+        Index("ix_stops_county_id_id", "county_id", "id"),
+        Index("ix_stops_name", "name", unique=True),
+    )
+
     # Relationship to County
     county: Mapped["County"] = relationship("County", backref="stops")
 
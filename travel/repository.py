@@ -0,0 +1,12 @@
+"""
+Hot stop lookups, built once at import with bound parameters (see auth/repository.py).
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+from . import models
+
+STOP_BY_ID = select(models.Stop).where(models.Stop.id == bindparam("stop_id")).limit(1)
+
+
+def get_stop(db: Session, stop_id: int) -> models.Stop | None:
+    return db.execute(STOP_BY_ID, {"stop_id": stop_id}).scalars().first()
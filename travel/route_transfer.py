@@ -0,0 +1,242 @@
+"""
+NDJSON export / import of route templates, for moving them between environments.
+
+One line per template:
+  {"ref": 12, "name": ..., "start_location": ..., "destination": ..., "is_active": true,
+   "groups": ["..."], "nodes": [{"ref": 40, "stop": "CK-1-Bantry", "price": 10.0, "next": 41}, ...]}
+
+"ref" is the id in the source database; "next" is the ref of the next node, which may belong
+to another template in the same file (a shared / merged branch). Stops are matched by name
+(unique, see travel.stop_import), route groups by name (created if missing).
+
+The export streams rows off a server-side cursor and the import stages lines into temp tables
+in batches, then inserts routes, nodes and next_stop_id links with a few set-based statements
+in one transaction, so neither side holds the whole catalog in memory.
+"""
+import json
+import time
+from itertools import groupby
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from core.app.database import SessionLocal
+from .models import RouteTemplate, StopNode, Stop, RouteGroup, route_group_association
+from .stop_paths import refresh_stop_paths
+
+BATCH_SIZE = 1000
+
+
+# -----------------------------
+# Export
+# -----------------------------
+def export_route_templates(batch_size: int = BATCH_SIZE):
+    """Yield one NDJSON line per route template, in id order"""
+    # Grouped once and joined: the association's key leads with group_id, so a per-route
+    # subquery would scan it for every row
+    groups = (
+        select(route_group_association.c.route_id, func.array_agg(RouteGroup.name).label("names"))
+        .join(RouteGroup, RouteGroup.id == route_group_association.c.group_id)
+        .group_by(route_group_association.c.route_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            RouteTemplate.id, RouteTemplate.name, RouteTemplate.start_location,
+            RouteTemplate.destination, RouteTemplate.is_active, groups.c.names,
+            StopNode.id, StopNode.price, StopNode.next_stop_id, Stop.name,
+        )
+        .outerjoin(groups, groups.c.route_id == RouteTemplate.id)
+        .outerjoin(StopNode, StopNode.route_id == RouteTemplate.id)
+        .outerjoin(Stop, Stop.id == StopNode.stop_id)
+        .order_by(RouteTemplate.id, StopNode.id)
+    )
+
+    # Its own session: the response streams after the request's dependencies are done
+    with SessionLocal() as db:
+        rows = db.execute(stmt, execution_options={"yield_per": batch_size})
+        for route_id, route_rows in groupby(rows, key=lambda row: row[0]):
+            first = next(route_rows)
+            nodes = [
+                {"ref": row[6], "stop": row[9], "price": row[7], "next": row[8]}
+                for row in (first, *route_rows)
+                if row[6] is not None
+            ]
+            yield json.dumps({
+                "ref": route_id,
+                "name": first[1],
+                "start_location": first[2],
+                "destination": first[3],
+                "is_active": first[4],
+                "groups": sorted(first[5] or []),
+                "nodes": nodes,
+            }) + "\n"
+
+
+# -----------------------------
+# Import
+# -----------------------------
+STAGING = """
+CREATE TEMP TABLE route_import_routes (
+    ref bigint PRIMARY KEY,
+    id integer,
+    name text,
+    start_location text,
+    destination text,
+    is_active boolean,
+    groups text[]
+) ON COMMIT DROP;
+CREATE TEMP TABLE route_import_nodes (
+    ref bigint PRIMARY KEY,
+    id integer,
+    route_ref bigint,
+    stop_name text,
+    price double precision,
+    next_ref bigint
+) ON COMMIT DROP
+"""
+
+STAGE_ROUTES = """
+INSERT INTO route_import_routes (ref, name, start_location, destination, is_active, groups)
+SELECT ref, name, start_location, destination, is_active,
+       CASE WHEN groups = '' THEN '{}'::text[] ELSE string_to_array(groups, chr(31)) END
+FROM unnest(CAST(:ref AS bigint[]), CAST(:name AS text[]), CAST(:start_location AS text[]),
+            CAST(:destination AS text[]), CAST(:is_active AS boolean[]), CAST(:groups AS text[]))
+    AS t(ref, name, start_location, destination, is_active, groups)
+"""
+
+STAGE_NODES = """
+INSERT INTO route_import_nodes (ref, route_ref, stop_name, price, next_ref)
+SELECT * FROM unnest(CAST(:ref AS bigint[]), CAST(:route_ref AS bigint[]), CAST(:stop_name AS text[]),
+                     CAST(:price AS double precision[]), CAST(:next_ref AS bigint[]))
+"""
+
+MISSING_STOPS = """
+SELECT DISTINCT n.stop_name FROM route_import_nodes n
+LEFT JOIN stops s ON s.name = n.stop_name
+WHERE s.id IS NULL ORDER BY 1 LIMIT 20
+"""
+
+DANGLING_LINKS = """
+SELECT n.ref, n.next_ref FROM route_import_nodes n
+LEFT JOIN route_import_nodes nx ON nx.ref = n.next_ref
+WHERE n.next_ref IS NOT NULL AND nx.ref IS NULL ORDER BY 1 LIMIT 20
+"""
+
+# New ids up front, so nodes can be inserted with their next_stop_id links in one statement
+# (foreign keys are checked at the end of it)
+ASSIGN_IDS = """
+UPDATE route_import_routes SET id = nextval(pg_get_serial_sequence('routestemplate', 'id'));
+UPDATE route_import_nodes SET id = nextval(pg_get_serial_sequence('stop_nodes', 'id'))
+"""
+
+INSERT_ROUTES = """
+INSERT INTO routestemplate (id, name, start_location, destination, is_active, stop_ids)
+SELECT id, name, start_location, destination, is_active, '{}' FROM route_import_routes
+"""
+
+INSERT_NODES = """
+INSERT INTO stop_nodes (id, route_id, stop_id, price, next_stop_id)
+SELECT n.id, r.id, s.id, n.price, nx.id
+FROM route_import_nodes n
+JOIN route_import_routes r ON r.ref = n.route_ref
+JOIN stops s ON s.name = n.stop_name
+LEFT JOIN route_import_nodes nx ON nx.ref = n.next_ref
+"""
+
+INSERT_GROUPS = """
+INSERT INTO route_groups (name)
+SELECT DISTINCT unnest(groups) FROM route_import_routes
+ON CONFLICT (name) DO NOTHING;
+INSERT INTO route_group_association (group_id, route_id)
+SELECT g.id, r.id
+FROM route_import_routes r
+CROSS JOIN LATERAL unnest(r.groups) AS gn(name)
+JOIN route_groups g ON g.name = gn.name
+"""
+
+
+def _stage(db: Session, routes: dict, nodes: dict):
+    if routes["ref"]:
+        db.execute(text(STAGE_ROUTES), routes)
+    if nodes["ref"]:
+        db.execute(text(STAGE_NODES), nodes)
+    for batch in (routes, nodes):
+        for column in batch.values():
+            column.clear()
+
+
+def import_route_templates(db: Session, lines, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Create templates from export lines (an open text file or any iterable of lines) and commit.
+    Templates are always added as new rows; refs only link nodes within the file.
+    """
+    started = time.perf_counter()
+    routes = {k: [] for k in ("ref", "name", "start_location", "destination", "is_active", "groups")}
+    nodes = {k: [] for k in ("ref", "route_ref", "stop_name", "price", "next_ref")}
+    route_count = node_count = 0
+    # Refs are the staging tables' primary keys: repeats are caught here, with their line
+    route_refs, node_refs = set(), set()
+
+    try:
+        for statement in STAGING.split(";"):
+            db.execute(text(statement))
+
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            first_node = len(nodes["ref"])
+            try:
+                route = json.loads(line)
+                routes["ref"].append(int(route["ref"]))
+                routes["name"].append(route["name"])
+                routes["start_location"].append(route["start_location"])
+                routes["destination"].append(route["destination"])
+                routes["is_active"].append(bool(route.get("is_active", True)))
+                # Groups travel as one delimited string: unnest can't take a ragged text[][]
+                routes["groups"].append(chr(31).join(route.get("groups") or []))
+                for node in route.get("nodes") or []:
+                    nodes["ref"].append(int(node["ref"]))
+                    nodes["route_ref"].append(int(route["ref"]))
+                    nodes["stop_name"].append(node["stop"])
+                    nodes["price"].append(float(node["price"]))
+                    nodes["next_ref"].append(None if node.get("next") is None else int(node["next"]))
+            except (ValueError, KeyError, TypeError) as e:
+                raise HTTPException(status_code=400, detail=f"Line {line_no}: invalid route ({e!r})")
+            if routes["ref"][-1] in route_refs:
+                raise HTTPException(status_code=400, detail=f"Line {line_no}: duplicate route ref {routes['ref'][-1]}")
+            route_refs.add(routes["ref"][-1])
+            for ref in nodes["ref"][first_node:]:
+                if ref in node_refs:
+                    raise HTTPException(status_code=400, detail=f"Line {line_no}: duplicate node ref {ref}")
+                node_refs.add(ref)
+            route_count += 1
+            node_count += len(route.get("nodes") or [])
+            if len(routes["ref"]) >= batch_size or len(nodes["ref"]) >= batch_size:
+                _stage(db, routes, nodes)
+        _stage(db, routes, nodes)
+
+        missing = db.execute(text(MISSING_STOPS)).scalars().all()
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown stops: {', '.join(missing)}")
+        dangling = db.execute(text(DANGLING_LINKS)).all()
+        if dangling:
+            refs = ", ".join(f"{ref} -> {next_ref}" for ref, next_ref in dangling)
+            raise HTTPException(status_code=400, detail=f"Nodes link to refs not in the file: {refs}")
+
+        for sql in (ASSIGN_IDS, INSERT_ROUTES, INSERT_NODES, INSERT_GROUPS):
+            for statement in sql.split(";"):
+                db.execute(text(statement))
+
+        route_ids = db.execute(text("SELECT id FROM route_import_routes ORDER BY id")).scalars().all()
+        for start in range(0, len(route_ids), batch_size):
+            refresh_stop_paths(db, RouteTemplate, StopNode, route_ids[start:start + batch_size])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    print(
+        f"📥 Route template import: {route_count} templates, {node_count} nodes "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return {"routes": route_count, "nodes": node_count, "route_ids": route_ids}
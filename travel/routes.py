@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-from core.app.database import get_db
+from core.app.database import get_db, get_read_db
 from auth.utils import super_admin_only
-from . import models, schemas
+from . import models, schemas, repository
 from .models import RouteTemplate, StopNode, Stop, RouteGroup
 from travel.schemas import *
-from travel.utils import find_matching_subsequence, cleanup_node_references ,build_full_route_from_node, attach_full_stop_nodes
+from travel.utils import find_matching_subsequence, load_full_stop_nodes, delete_route_template, update_route_nodes
+from sqlalchemy.orm import selectinload, aliased, joinedload, noload
+from sqlalchemy import select, func
+from travel.stop_paths import routes_passing
+from travel.spatial import stop_index, stop_geojson
+from utils.geo import parse_bbox
+from travel.distances import route_legs, template_legs
+from travel.stop_import import import_stops_csv
+from travel.route_transfer import export_route_templates, import_route_templates
 router = APIRouter(prefix="/travel", tags=["Travel"], dependencies=[Depends(super_admin_only)])
+# Passenger-facing endpoints (no admin dependency); included ahead of `router`
+public_router = APIRouter(prefix="/travel", tags=["Travel"])
 
 # --- County Routes ---
 @router.post("/counties/", response_model=schemas.CountyOut)
@@ -33,7 +45,7 @@ def create_county(county: schemas.CountyCreate, db: Session = Depends(get_db)):
     return db_county
 
 @router.get("/counties/", response_model=List[schemas.CountyOut])
-def read_counties(db: Session = Depends(get_db)):
+def read_counties(db: Session = Depends(get_read_db)):
     """
     Get all counties.
     Returns: [{"id": 1, "name": "Dublin", "short_code": "DUB", "telephone_code": "01", ...}, ...]
@@ -42,7 +54,7 @@ def read_counties(db: Session = Depends(get_db)):
     return counties
 
 @router.get("/counties/{county_id}", response_model=schemas.CountyOut)
-def read_county(county_id: int, db: Session = Depends(get_db)):
+def read_county(county_id: int, db: Session = Depends(get_read_db)):
     """
     Get a single county by ID.
     """
@@ -150,6 +162,10 @@ def create_stop(stop: schemas.StopCreate, db: Session = Depends(get_db)):
         
     else:
         raise HTTPException(status_code=400, detail="Either 'county' (name) or 'county_id' must be provided")
+
+    # Stop names are unique (the bulk import upserts by name)
+    if db.query(models.Stop.id).filter(models.Stop.name == stop_data['name']).first():
+        raise HTTPException(status_code=400, detail="Stop with this name already exists")
     
     db_stop = models.Stop(**stop_data)
     db.add(db_stop)
@@ -158,44 +174,100 @@ def create_stop(stop: schemas.StopCreate, db: Session = Depends(get_db)):
     return db_stop
 
 
+@router.post("/stops/import", response_model=schemas.StopImportOut)
+def import_stops(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Bulk-upsert stops from a CSV in the "Maps Master _ PUP Codes" format
+    (RouteName,StopOrder,City,Location,Lat,Lon), matched to existing stops by name.
+    Also available as a CLI: python seed_stops_from_csv.py [file.csv]
+    """
+    return import_stops_csv(db, io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+
+
 @router.get("/stops/", response_model=List[schemas.StopOut])
-def read_stops(db: Session = Depends(get_db)):
+def read_stops(
+    response: Response,
+    after_id: int | None = Query(None, ge=0),
+    limit: int | None = Query(None, ge=1, le=1000),
+    county_id: int | None = None,
+    include_county: bool = True,
+    db: Session = Depends(get_read_db),
+):
     """
-    Get all stops as a simple array.
+    Get stops as a simple array, ordered by id.
     Returns: [{"id": 1, "name": "...", "county": "Dublin", "location": "...", "lat": ..., "lng": ...}, ...]
+    Without after_id / limit every stop is returned, as before. With either, one page of
+    `limit` stops (default 100) comes back, and while more may follow the X-Next-After-Id
+    header holds the after_id for the next page. include_county=false leaves county out
+    (null) instead of joining counties.
     """
-    stops = db.query(models.Stop).all()
+    query = db.query(models.Stop)
+    if county_id is not None:
+        query = query.filter(models.Stop.county_id == county_id)
+    if after_id is not None:
+        query = query.filter(models.Stop.id > after_id)
+    query = query.options(joinedload(models.Stop.county) if include_county else noload(models.Stop.county))
+    query = query.order_by(models.Stop.id)
+    if after_id is None and limit is None:
+        return query.all()
+
+    limit = limit or 100
+    # One extra row tells whether there is a next page
+    stops = query.limit(limit + 1).all()
+    if len(stops) > limit:
+        stops = stops[:limit]
+        response.headers["X-Next-After-Id"] = str(stops[-1].id)
     return stops
 
 
+@public_router.get("/stops/nearest", response_model=List[schemas.NearestStopOut])
+def read_nearest_stops(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    radius_km: float | None = Query(None, gt=0),
+):
+    """
+    The k stops closest to (lat, lng), nearest first, optionally only within radius_km.
+    Served from the in-memory stop grid; the database is only read when it is (re)built.
+    """
+    return stop_index.get().nearest(lat, lng, k, radius_km)
+
+
 @router.get("/stops/geojson", response_model=schemas.StopGeoJSONFeatureCollection)
-def read_stops_geojson(db: Session = Depends(get_db)):
+def read_stops_geojson(request: Request):
     """
     Get all stops as a GeoJSON FeatureCollection.
     This format is compatible with mapping libraries like Leaflet, Mapbox, etc.
+    Served pre-serialized (gzip when accepted) with an ETag; If-None-Match gets a 304.
     """
-    stops = db.query(models.Stop).all()
-    
-    features = [stop.to_geojson() for stop in stops]
-    
-    return {
-        "type": "FeatureCollection",
-        "features": features
-    }
+    return stop_geojson.get().response(request)
+
+@router.get("/stops/clusters", response_model=schemas.MapFeatureCollection)
+def read_stop_clusters(bbox: str, zoom: int = Query(..., ge=0, le=22)):
+    """
+    Stops in the viewport as GeoJSON, clustered for the zoom level.
+    bbox: "min_lng,min_lat,max_lng,max_lat". Cluster features carry point_count.
+    """
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {e}")
+    return stop_index.get().cluster_geojson(box, zoom)
 
 @router.get("/stops/{stop_id}", response_model=schemas.StopBase)
-def read_stop(stop_id: int, db: Session = Depends(get_db)):
-    stop = db.query(models.Stop).filter(models.Stop.id == stop_id).first()
+def read_stop(stop_id: int, db: Session = Depends(get_read_db)):
+    stop = repository.get_stop(db, stop_id)
     if stop is None:
         raise HTTPException(status_code=404, detail="Stop not found")
     return stop
 
 @router.get("/stops/{stop_id}/geojson", response_model=schemas.StopGeoJSONFeature)
-def read_stop_geojson(stop_id: int, db: Session = Depends(get_db)):
+def read_stop_geojson(stop_id: int, db: Session = Depends(get_read_db)):
     """
     Get a single stop as a GeoJSON Feature.
     """
-    stop = db.query(models.Stop).filter(models.Stop.id == stop_id).first()
+    stop = repository.get_stop(db, stop_id)
     if stop is None:
         raise HTTPException(status_code=404, detail="Stop not found")
     return stop.to_geojson()
@@ -206,11 +278,16 @@ def update_stop(stop_id: int, stop_update: schemas.StopUpdate, db: Session = Dep
     Update a stop by ID.
     Updates all fields: name, county (name) OR county_id, location, lat, lng.
     """
-    stop = db.query(models.Stop).filter(models.Stop.id == stop_id).first()
+    stop = repository.get_stop(db, stop_id)
     if stop is None:
         raise HTTPException(status_code=404, detail="Stop not found")
     
     stop_data = stop_update.model_dump(exclude_unset=True)
+
+    if stop_data.get('name') and db.query(models.Stop.id).filter(
+        models.Stop.id != stop_id, models.Stop.name == stop_data['name']
+    ).first():
+        raise HTTPException(status_code=400, detail="Another stop with this name already exists")
     
     # Handle county_id update if present
     if 'county_id' in stop_data:
@@ -245,7 +322,7 @@ def delete_stop(stop_id: int, db: Session = Depends(get_db)):
     Delete a stop by ID.
     Returns 204 No Content on success.
     """
-    stop = db.query(models.Stop).filter(models.Stop.id == stop_id).first()
+    stop = repository.get_stop(db, stop_id)
     if stop is None:
         raise HTTPException(status_code=404, detail="Stop not found")
     
@@ -338,10 +415,23 @@ def create_route(
 # -----------------------------
 @router.get("/admin/routes/template", response_model=List[schemas.RouteSummaryOut])
 def read_routes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    routes = db.query(models.RouteTemplate).offset(skip).limit(limit).all()
+    # One statement: the page of routes, joined to stop counts grouped for just that page
+    page = db.query(models.RouteTemplate).order_by(models.RouteTemplate.id).offset(skip).limit(limit).subquery()
+    page_route = aliased(models.RouteTemplate, page)
+    counts = (
+        select(models.StopNode.route_id, func.count().label("stop_count"))
+        .where(models.StopNode.route_id.in_(select(page.c.id)))
+        .group_by(models.StopNode.route_id)
+        .subquery()
+    )
+    rows = (
+        db.query(page_route, func.coalesce(counts.c.stop_count, 0))
+        .outerjoin(counts, counts.c.route_id == page_route.id)
+        .order_by(page_route.id)
+        .all()
+    )
     result = []
-    for route in routes:
-        stop_count = db.query(models.StopNode).filter_by(route_id=route.id).count()
+    for route, stop_count in rows:
         result.append({
             "id": route.id,
             "name": route.name,
@@ -353,41 +443,90 @@ def read_routes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return result
 
 
+# -----------------------------
+# Routes Passing Stops
+# -----------------------------
+@router.get("/admin/routes/template/by-stops", response_model=List[schemas.RoutePathOut])
+def read_routes_by_stops(stop_ids: List[int] = Query(...), db: Session = Depends(get_read_db)):
+    """
+    Routes that pass all the given stops, in the given order (e.g. ?stop_ids=3&stop_ids=7 for
+    routes going from stop 3 to stop 7). Uses the GIN-indexed stop_ids path column.
+    """
+    return routes_passing(db, models.RouteTemplate, stop_ids)
+
+
+# -----------------------------
+# Export / Import (NDJSON)
+# -----------------------------
+@router.get("/admin/routes/template/export")
+def export_routes():
+    """
+    Stream every route template, with its stop nodes and next_stop_id links, as NDJSON
+    (one template per line; stops and groups by name). Load it with /import.
+    """
+    return StreamingResponse(
+        export_route_templates(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="route-templates.ndjson"'},
+    )
+
+
+@router.post("/admin/routes/template/import", response_model=schemas.RouteImportOut)
+def import_routes(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Create route templates from an /export file in one transaction. Stops must already
+    exist (matched by name); missing route groups are created.
+    """
+    return import_route_templates(db, io.TextIOWrapper(file.file, encoding="utf-8"))
+
+
+# -----------------------------
+# Route Legs (distance / travel time)
+# -----------------------------
+@router.post("/admin/route-legs", response_model=schemas.RouteLegsOut)
+def read_route_legs_for_stops(data: schemas.RouteLegsRequest, db: Session = Depends(get_read_db)):
+    """
+    Per-leg and total distance / estimated travel time for a stop sequence being built,
+    optionally ending at a venue.
+    """
+    if not data.stop_ids:
+        raise HTTPException(status_code=400, detail="stop_ids must not be empty")
+    return route_legs(db, data.stop_ids, data.venue_id)
+
+
+@router.get("/admin/routes/template/{route_id}/legs", response_model=schemas.RouteLegsOut)
+def read_route_legs(route_id: int, venue_id: int | None = None, db: Session = Depends(get_read_db)):
+    """
+    Per-leg distances / travel times of a saved route, branch by branch along its node
+    chain, and the total route length, optionally with a final leg to a venue.
+    """
+    route = db.get(models.RouteTemplate, route_id)
+    if not route:
+        raise HTTPException(status_code=404, detail="Route not found")
+    return template_legs(db, route.id, venue_id)
+
+
 # -----------------------------
 # Read Route Detail
 # -----------------------------
 @router.get("/admin/routes/all-template/", response_model=list[RouteDetailOut])
-def read_all_routes(db: Session = Depends(get_db)):
+def read_all_routes(db: Session = Depends(get_read_db)):
     routes = db.query(RouteTemplate).all()
 
-    for route in routes:
-        attach_full_stop_nodes(route)
-
-    return routes
+    return load_full_stop_nodes(db, routes)
 
     
 @router.get("/admin/routes/template/{route_id}", response_model=RouteDetailOut)
-def read_route(route_id: int, db: Session = Depends(get_db)):
+def read_route(route_id: int, db: Session = Depends(get_read_db)):
     route = db.query(RouteTemplate).filter(RouteTemplate.id == route_id).first()
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
-    all_nodes = []
-    visited = set()
-    # Traverse each starting stop node of this route
-    for node in route.stop_nodes:
-        if not node.previous_stop_node:  # starting nodes
-            nodes_from_here = build_full_route_from_node(node, visited)
-            all_nodes.extend(nodes_from_here)
-
-    # Deduplicate nodes (in case of branches)
-    unique_nodes = {node.id: node for node in all_nodes}.values()
-    route.stop_nodes = list(unique_nodes)
-
-    return route
+    # Whole chain (including branches and merged-in nodes) in one query
+    return load_full_stop_nodes(db, [route])[0]
 
 # -----------------------------
-# Update Route (Full Replace with Branching Logic)
+# Update Route (diffed against the current chain)
 # -----------------------------
 @router.put("/admin/routes/template/{route_id}", response_model=schemas.RouteOut)
 def update_route(
@@ -404,74 +543,8 @@ def update_route(
     route.destination = data.destination
     route.is_active = data.is_active
 
-    # Cleanup references
-    old_nodes = db.query(models.StopNode).filter_by(route_id=route_id).all()
-    for node in old_nodes:
-        cleanup_node_references(db, node, route_id)
-
-    # Delete only this route's nodes
-    db.query(models.StopNode).filter_by(route_id=route_id).delete()
-    db.flush()
-
-    # Rebuild chain (exclude self)
-    match_info = find_matching_subsequence(
-        db,
-        data.stop_nodes,
-        exclude_route_id=route_id
-    )
-
-    last_node = None
-
-    if match_info:
-        match_start_idx, existing_chain = match_info
-
-        # Ensure we create at least one node for the new route to give it an entry point.
-        # If the match starts at index 0, we create the first node and merge at the second.
-        if match_start_idx == 0 and len(existing_chain) > 1:
-            match_start_idx = 1
-            existing_chain = existing_chain[1:]
-
-        for i in range(match_start_idx):
-            stop = data.stop_nodes[i]
-            node = models.StopNode(
-                route_id=route.id,
-                stop_id=stop.stop_id,
-                price=stop.price
-            )
-            db.add(node)
-            db.flush()
-
-            if last_node:
-                last_node.next_stop_id = node.id
-                db.add(last_node)
-
-            last_node = node
-
-        merge_node = existing_chain[0]
-        last_node.next_stop_id = merge_node.id
-
-        if last_node not in merge_node.previous_stop_node:
-            merge_node.previous_stop_node.append(last_node)
-
-        db.add(last_node)
-        db.add(merge_node)
-
-    else:
-
-        for stop in data.stop_nodes:
-            node = models.StopNode(
-                route_id=route.id,
-                stop_id=stop.stop_id,
-                price=stop.price
-            )
-            db.add(node)
-            db.flush()
-
-            if last_node:
-                last_node.next_stop_id = node.id
-                db.add(last_node)
-
-            last_node = node
+    # Diff the stop list against the current chain: unchanged nodes keep their ids
+    update_route_nodes(db, route, data.stop_nodes)
 
     db.commit()
     db.refresh(route)
@@ -485,45 +558,10 @@ def delete_route(route_id: int, db: Session = Depends(get_db)):
     """
     Deletes a route and cleans up its nodes intelligently:
     - If a node is used ONLY by this route: delete it
-    - If a node is shared with other routes: keep it, remove links
+    - If a node is shared with other routes: keep it (handed over to a route that uses it)
     """
-    route = db.query(models.RouteTemplate).filter_by(id=route_id).first()
-    if not route:
+    if not delete_route_template(db, route_id):
         raise HTTPException(status_code=404, detail="Route not found")
-    
-    # Get all nodes belonging to this route
-    route_nodes = db.query(models.StopNode).filter_by(route_id=route_id).all()
-    
-    
-    # Process each node
-    for node in route_nodes:
-        # Check if this node is shared (has previous nodes from other routes)
-        other_route_previous_nodes = [
-            prev for prev in node.previous_stop_node 
-            if prev.route_id != route_id
-        ]
-        
-        if other_route_previous_nodes:
-            # Node is shared - keep it but remove links from this route's nodes
-            
-            # Remove previous nodes that belong to this route
-            node.previous_stop_node = [
-                prev for prev in node.previous_stop_node 
-                if prev.route_id != route_id
-            ]
-            db.add(node)
-            
-        else:
-            # Node is only used by this route - safe to delete
-            
-            # Clean up references in other nodes before deleting
-            cleanup_node_references(db, node, route_id)
-            
-            # Delete the node
-            db.delete(node)
-    
-    # Delete the route itself
-    db.delete(route)
     db.commit()
     return None
 
@@ -552,7 +590,7 @@ def create_route_group(data: RouteGroupCreate, db: Session = Depends(get_db)):
 # GET Route Group
 # -----------------------------
 @router.get("/admin/route-groups", response_model=list[RouteGroupOut])
-def list_route_groups(db: Session = Depends(get_db)):
+def list_route_groups(db: Session = Depends(get_read_db)):
     groups = db.query(RouteGroup).all()
 
     return [
@@ -566,15 +604,13 @@ def list_route_groups(db: Session = Depends(get_db)):
 
 
 @router.get("/admin/route-groups/detailed", response_model=list[schemas.RouteGroupDetailedOut])
-def list_route_groups_detailed(db: Session = Depends(get_db)):
+def list_route_groups_detailed(db: Session = Depends(get_read_db)):
     """
     Get all route groups with full route and stop details.
     """
-    groups = db.query(models.RouteGroup).all()
+    groups = db.query(models.RouteGroup).options(selectinload(models.RouteGroup.routes)).all()
     
-    for group in groups:
-        for route in group.routes:
-            attach_full_stop_nodes(route)
+    load_full_stop_nodes(db, list({route.id: route for group in groups for route in group.routes}.values()))
             
     return groups
 
@@ -582,7 +618,7 @@ def list_route_groups_detailed(db: Session = Depends(get_db)):
 # GET per id Route Group
 # ----------------------------- 
 @router.get("/admin/route-groups/{group_id}", response_model=RouteGroupOut)
-def get_route_group(group_id: int, db: Session = Depends(get_db)):
+def get_route_group(group_id: int, db: Session = Depends(get_read_db)):
     group = db.get(RouteGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Route group not found")
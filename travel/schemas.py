@@ -52,6 +52,20 @@ class StopUpdate(BaseModel):
     county_id: Optional[int] = None
 
 
+class NearestStopOut(StopBase):
+    id: int
+    county_id: int
+    distance_km: float
+
+
+class StopImportOut(BaseModel):
+    rows: int
+    inserted: int
+    updated: int
+    skipped: List[str]
+    unresolved_counties: List[str]
+
+
 class StopOut(StopBase):
     id: int
     county_id: int
@@ -96,6 +110,12 @@ class StopNodeRef(BaseModel):
         from_attributes = True
 class StopProperties(BaseModel):
     id: int
+    name: str
+    county_id: Optional[int] = None
+    county_name: Optional[str] = None
+    location: str
+    created_at: datetime
+    updated_at: datetime
 
 # ---- Output schema
 class StopNodeOut(BaseModel):
@@ -134,6 +154,18 @@ class StopGeoJSONFeature(BaseModel):
 class StopGeoJSONFeatureCollection(BaseModel):
     type: str = "FeatureCollection"
     features: List[StopGeoJSONFeature]
+
+
+class MapFeature(BaseModel):
+    type: str = "Feature"
+    geometry: GeoJSONGeometry
+    properties: dict  # point fields, or {cluster, cluster_id, point_count}
+
+
+class MapFeatureCollection(BaseModel):
+    type: str = "FeatureCollection"
+    features: List[MapFeature]
+
 class RouteOut(BaseModel):
     id: int
     name: str
@@ -158,6 +190,44 @@ class RouteSummaryOut(BaseModel):
         from_attributes = True
 
 
+class RouteImportOut(BaseModel):
+    routes: int
+    nodes: int
+    route_ids: List[int]
+
+
+class RoutePathOut(BaseModel):
+    id: int
+    name: str
+    start_location: str
+    destination: str
+    is_active: bool
+    stop_ids: List[int] = []  # ordered, full chain
+
+    class Config:
+        from_attributes = True
+
+
+class RouteLegsRequest(BaseModel):
+    stop_ids: List[int]  # ORDER MATTERS
+    venue_id: Optional[int] = None  # add a final leg to this venue
+
+
+class RouteLegOut(BaseModel):
+    from_type: str  # "stop" | "venue"
+    from_id: int
+    to_type: str
+    to_id: int
+    distance_km: float
+    minutes: float
+
+
+class RouteLegsOut(BaseModel):
+    legs: List[RouteLegOut]
+    total_distance_km: float
+    total_minutes: float
+
+
 class RouteDetailOut(BaseModel):
     id: int
     name: str
@@ -0,0 +1,87 @@
+"""
+In-memory spatial index of the stops table: nearest-stop lookups and map clusters, plus the
+pre-serialized stops GeoJSON collection.
+
+Both are snapshots (core.app.snapshot): built from one query on first use, dropped when
+this process commits a Stop or County insert/update/delete, and rebuilt after
+SNAPSHOT_TTL_SECONDS so changes made by other workers show up too.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+from core.app.snapshot import SnapshotCache, Payload
+from utils.geo import PointGrid, ClusterIndex, cluster_features
+from .models import County, Stop
+from .schemas import StopGeoJSONFeatureCollection
+
+
+class StopIndex:
+    def __init__(self, rows):
+        self.stops = {
+            row.id: {
+                "id": row.id,
+                "name": row.name,
+                "location": row.location,
+                "lat": row.lat,
+                "lng": row.lng,
+                "county_id": row.county_id,
+                "county_name": row.county_name,
+            }
+            for row in rows
+        }
+        self.points = list(self.stops.values())
+        lats = [s["lat"] for s in self.points]
+        lngs = [s["lng"] for s in self.points]
+        self.grid = PointGrid(list(self.stops), lats, lngs)
+        self.clusters = ClusterIndex(lats, lngs)
+
+    def nearest(self, lat: float, lng: float, k: int = 5, radius_km: float | None = None) -> list[dict]:
+        return [
+            {**self.stops[stop_id], "distance_km": round(distance, 3)}
+            for stop_id, distance in self.grid.nearest(lat, lng, k, radius_km)
+        ]
+
+    def cluster_geojson(self, bbox, zoom: int) -> dict:
+        return {"type": "FeatureCollection", "features": cluster_features(self.clusters, self.points, bbox, zoom)}
+
+
+def load_stop_index(db: Session, key=None) -> StopIndex:
+    rows = (
+        db.query(Stop.id, Stop.name, Stop.location, Stop.lat, Stop.lng, Stop.county_id, County.name.label("county_name"))
+        .outerjoin(County, County.id == Stop.county_id)
+        .all()
+    )
+    return StopIndex(rows)
+
+
+stop_index = SnapshotCache("stops", load_stop_index)
+
+
+def load_stop_geojson(db: Session, key=None) -> Payload:
+    stops = db.query(Stop).options(joinedload(Stop.county)).order_by(Stop.id).all()
+    # Through the response model, so the served body is exactly what /stops/geojson documents
+    collection = StopGeoJSONFeatureCollection.model_validate({"features": [stop.to_geojson() for stop in stops]})
+    return Payload(collection.model_dump())
+
+
+stop_geojson = SnapshotCache("stops_geojson", load_stop_geojson)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_stop_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        # County names are denormalized into both snapshots
+        if isinstance(obj, (Stop, County)):
+            session.info["stops_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stop_index(session):
+    if session.info.pop("stops_changed", False):
+        stop_index.invalidate()
+        stop_geojson.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stop_writes(session):
+    session.info.pop("stops_changed", None)
@@ -0,0 +1,174 @@
+"""
+Bulk stop import from the "Maps Master _ PUP Codes" CSV format
+(RouteName,StopOrder,City,Location,Lat,Lon).
+
+Rows are cleaned while streaming, COPY'd into a temp staging table, then resolved to counties
+and upserted into stops by name in one INSERT ... ON CONFLICT. Stops are named
+"<RouteName>-<StopOrder>-<City>", as seed_stops_from_csv.py always did.
+"""
+import csv
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .spatial import stop_index, stop_geojson
+from .tiles import tile_cache
+
+# Mapping from RouteName in CSV to County Name in DB
+ROUTE_TO_COUNTY_MAP = {
+    "CK": "Cork",
+    "DG": "Donegal",
+    "GY": "Galway",
+    "KY": "Kerry",
+    "MO": "Mayo",
+    "SO": "Sligo",
+    "WD": "Waterford",
+    "WX": "Wexford"
+}
+
+NAME_LENGTH = 50  # stops.name is String(50)
+
+STAGING = """
+CREATE TEMP TABLE stops_import (
+    line integer,
+    route_name text,
+    city text,
+    name text,
+    location text,
+    lat double precision,
+    lng double precision
+) ON COMMIT DROP
+"""
+
+# County by the route map, else RouteName as a short code, else City as a county name
+RESOLVE = """
+WITH route_map(code, county) AS (SELECT * FROM unnest(CAST(:codes AS text[]), CAST(:counties AS text[]))),
+resolved AS (
+    SELECT s.line, s.route_name, s.city, s.name, s.location, s.lat, s.lng,
+           COALESCE(by_map.id, by_code.id, by_city.id) AS county_id
+    FROM stops_import s
+    LEFT JOIN route_map m ON m.code = s.route_name
+    LEFT JOIN counties by_map ON lower(by_map.name) = lower(m.county)
+    LEFT JOIN counties by_code ON by_code.short_code = s.route_name
+    LEFT JOIN counties by_city ON lower(by_city.name) = lower(s.city)
+)
+"""
+
+UNRESOLVED = RESOLVE + """
+SELECT DISTINCT route_name, city FROM resolved WHERE county_id IS NULL ORDER BY 1, 2
+"""
+
+# The last row for a name wins; unchanged stops are left alone
+UPSERT = RESOLVE + """
+INSERT INTO stops AS t (name, county_id, location, lat, lng, created_at, updated_at)
+SELECT DISTINCT ON (name) name, county_id, location, lat, lng, timezone('utc', now()), timezone('utc', now())
+FROM resolved
+WHERE county_id IS NOT NULL
+ORDER BY name, line DESC
+ON CONFLICT (name) DO UPDATE SET
+    county_id = EXCLUDED.county_id,
+    location = EXCLUDED.location,
+    lat = EXCLUDED.lat,
+    lng = EXCLUDED.lng,
+    updated_at = EXCLUDED.updated_at
+WHERE (t.county_id, t.location, t.lat, t.lng) IS DISTINCT FROM
+      (EXCLUDED.county_id, EXCLUDED.location, EXCLUDED.lat, EXCLUDED.lng)
+RETURNING (xmax = 0) AS inserted
+"""
+
+
+def _coordinate(value: str) -> float:
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+class _StagingRows:
+    """
+    File-like view of the CSV as cleaned staging rows, for cursor.copy_expert.
+    Rows missing RouteName / City, or whose name won't fit, are counted in `skipped`.
+    """
+    def __init__(self, lines):
+        self.reader = csv.DictReader(lines)
+        self.rows = 0
+        self.skipped = []
+        self._buffer = ""
+        self._writer = csv.writer(self, lineterminator="\n")
+
+    def write(self, chunk: str):
+        self._buffer += chunk
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self.reader, None)
+            if row is None:
+                break
+            self._stage(row)
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    def _stage(self, row: dict):
+        self.rows += 1
+        line = self.reader.line_num
+        route_name = (row.get("RouteName") or "").strip()
+        city = (row.get("City") or "").strip()
+        name = f"{route_name}-{(row.get('StopOrder') or '').strip()}-{city}"
+        if not route_name or not city:
+            self.skipped.append(f"line {line}: missing RouteName or City")
+            return
+        if len(name) > NAME_LENGTH:
+            self.skipped.append(f"line {line}: name '{name}' longer than {NAME_LENGTH}")
+            return
+        self._writer.writerow([
+            line, route_name, city, name, (row.get("Location") or "").strip(),
+            _coordinate((row.get("Lat") or "").strip()), _coordinate((row.get("Lon") or "").strip()),
+        ])
+
+
+def import_stops_csv(db: Session, lines) -> dict:
+    """
+    Upsert stops from CSV text lines (an open text file or any iterable of lines) and commit.
+    Returns counts, plus the skipped rows and the (RouteName, City) pairs with no county.
+    """
+    started = time.perf_counter()
+    rows = _StagingRows(lines)
+    try:
+        db.execute(text(STAGING))
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY stops_import (line, route_name, city, name, location, lat, lng) FROM STDIN WITH (FORMAT csv)",
+                rows,
+            )
+        finally:
+            cursor.close()
+
+        route_map = {"codes": list(ROUTE_TO_COUNTY_MAP), "counties": list(ROUTE_TO_COUNTY_MAP.values())}
+        unresolved = [f"{route_name} (City: {city})" for route_name, city in db.execute(text(UNRESOLVED), route_map)]
+        upserted = db.execute(text(UPSERT), route_map).scalars().all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Raw SQL skips the Stop session hooks, so drop the stop snapshots here
+    stop_index.invalidate()
+    stop_geojson.invalidate()
+    tile_cache.clear()
+
+    inserted = sum(1 for was_insert in upserted if was_insert)
+    result = {
+        "rows": rows.rows,
+        "inserted": inserted,
+        "updated": len(upserted) - inserted,
+        "skipped": rows.skipped,
+        "unresolved_counties": unresolved,
+    }
+    print(
+        f"📥 Stop import: {rows.rows} rows, {inserted} inserted, {result['updated']} updated, "
+        f"{len(rows.skipped)} skipped, {len(unresolved)} without county "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return result
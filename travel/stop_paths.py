@@ -0,0 +1,167 @@
+"""
+Materialized stop-id paths: every route row stores the ordered stop ids of its full chain
+(its own nodes, then whatever chain it merged into) in an INTEGER[] `stop_ids` column.
+
+The linked StopNode / EventStopNode lists stay the source of truth. Sessions note which
+routes had nodes written; before commit, those routes and every route whose chain runs
+through them get their path recomputed with one recursive UPDATE, inside the same
+transaction. With the GIN index, "which routes pass these stops" is an indexed `@>`.
+"""
+from sqlalchemy import Integer, cast, event, exists, func, inspect, literal, literal_column, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from .models import RouteTemplate, StopNode
+
+# Cycle guard for the recursive walk; no real route comes close
+MAX_PATH_LENGTH = 1000
+
+# node model -> route model
+_registry: dict = {}
+
+
+def register_stop_paths(route_model, node_model):
+    """Keep route_model.stop_ids in sync with the node_model chains"""
+    _registry[node_model] = route_model
+
+
+def stop_path_walk(node_model, route_ids):
+    """
+    Recursive CTE of (route_id, head_id, position, stop_id): each route's chain walked from
+    its first own node (one no node of the same route links to) along next_stop_id.
+    """
+    own_prev = aliased(node_model)
+    heads = select(
+        node_model.route_id,
+        node_model.id.label("head_id"),
+        node_model.id.label("node_id"),
+        node_model.next_stop_id,
+        node_model.stop_id,
+        literal(1).label("position"),
+    ).where(
+        node_model.route_id.in_(route_ids),
+        ~exists().where(own_prev.next_stop_id == node_model.id, own_prev.route_id == node_model.route_id),
+    )
+    walk = heads.cte("stop_walk", recursive=True)
+
+    node = aliased(node_model)
+    return walk.union_all(
+        select(
+            walk.c.route_id,
+            walk.c.head_id,
+            node.id,
+            node.next_stop_id,
+            node.stop_id,
+            walk.c.position + 1,
+        ).where(node.id == walk.c.next_stop_id, walk.c.position < MAX_PATH_LENGTH)
+    )
+
+
+def routes_upstream_of(db: Session, node_model, route_ids) -> set[int]:
+    """The given routes plus every route whose chain runs into one of their nodes"""
+    up = select(node_model.id, node_model.route_id).where(node_model.route_id.in_(route_ids)).cte("upstream", recursive=True)
+    prev = aliased(node_model)
+    up = up.union(select(prev.id, prev.route_id).where(prev.next_stop_id == up.c.id))
+    return set(route_ids) | set(db.execute(select(up.c.route_id).distinct()).scalars())
+
+
+def refresh_stop_paths(db: Session, route_model, node_model, route_ids) -> dict[int, list[int]]:
+    """Recompute stop_ids for the given routes in one UPDATE; returns {route_id: stop_ids}"""
+    route_ids = sorted(route_ids)
+    if not route_ids:
+        return {}
+
+    walk = stop_path_walk(node_model, route_ids)
+    paths = (
+        select(walk.c.route_id, func.array_agg(aggregate_order_by(walk.c.stop_id, walk.c.head_id, walk.c.position)).label("stop_ids"))
+        .group_by(walk.c.route_id)
+        .subquery("paths")
+    )
+    # Joined rather than correlated, so the walk is aggregated once for all routes;
+    # routes left without nodes get an empty path
+    targets = select(route_model.id).where(route_model.id.in_(route_ids)).subquery("targets")
+    source = (
+        select(targets.c.id, func.coalesce(paths.c.stop_ids, cast(literal_column("'{}'"), ARRAY(Integer))).label("stop_ids"))
+        .select_from(targets.outerjoin(paths, paths.c.route_id == targets.c.id))
+        .subquery("source")
+    )
+    rows = db.execute(
+        update(route_model)
+        .where(route_model.id == source.c.id)
+        .values(stop_ids=source.c.stop_ids)
+        .returning(route_model.id, route_model.stop_ids)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # Routes already loaded in this session see the new value without a reload
+    paths = {route_id: list(stop_ids) for route_id, stop_ids in rows}
+    for obj in db.identity_map.values():
+        if isinstance(obj, route_model) and obj.id in paths:
+            set_committed_value(obj, "stop_ids", paths[obj.id])
+    return paths
+
+
+def follows_in_order(path: list[int], stop_ids: list[int]) -> bool:
+    """True if stop_ids all appear in path, in this order (not necessarily adjacent)"""
+    remaining = iter(path)
+    return all(stop_id in remaining for stop_id in stop_ids)
+
+
+def routes_passing(db: Session, route_model, stop_ids: list[int]) -> list:
+    """Routes that pass all of stop_ids in the given order; the GIN index does the filtering"""
+    candidates = (
+        db.query(route_model)
+        .filter(route_model.stop_ids.contains(stop_ids))
+        .order_by(route_model.id)
+        .all()
+    )
+    return [route for route in candidates if follows_in_order(route.stop_ids, stop_ids)]
+
+
+# -----------------------------
+# Session hooks: note routes whose nodes changed, refresh their paths before commit
+# -----------------------------
+_PATH_COLUMNS = ("route_id", "stop_id", "next_stop_id")
+
+
+def track_route_paths(session: Session, node_model, route_ids):
+    """Queue routes for a path refresh at commit, for node writes flush events don't see"""
+    session.info.setdefault("stop_path_routes", {}).setdefault(node_model, set()).update(route_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_routes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        # loaded state only, so deleted/expired objects aren't reloaded here
+        route_id = vars(obj).get("route_id")
+        if type(obj) not in _registry or route_id is None:
+            continue
+        # A price edit doesn't move the path
+        if obj in session.dirty and not any(
+            inspect(obj).attrs[key].history.has_changes() for key in _PATH_COLUMNS
+        ):
+            continue
+        track_route_paths(session, type(obj), [route_id])
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_changed_routes(session):
+    session.flush()
+    changed = session.info.pop("stop_path_routes", None)
+    if not changed:
+        return
+    for node_model, route_ids in changed.items():
+        refresh_stop_paths(
+            session,
+            _registry[node_model],
+            node_model,
+            routes_upstream_of(session, node_model, route_ids),
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_routes(session):
+    session.info.pop("stop_path_routes", None)
+
+
+register_stop_paths(RouteTemplate, StopNode)
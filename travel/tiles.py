@@ -0,0 +1,121 @@
+"""
+Map tiles cut from the in-memory stop / venue indexes (clustered up to their max zoom, single
+points beyond it), encoded with utils.mvt and kept in an LRU snapshot cache keyed by
+(layer, z, x, y). A committed Stop / Venue write in this process drops only the tiles around
+its old and new position, at every zoom; a County write (stop tiles carry county_name) drops
+them all. Other workers' writes show up after SNAPSHOT_TTL_SECONDS.
+"""
+import math
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from core.app.snapshot import SnapshotCache
+from utils.geo import CLUSTER_MAX_ZOOM, CLUSTER_RADIUS_PX, mercator_xy
+from utils.mvt import EXTENT, encode_layer, encode_tile
+from event.models import Venue
+# Imported before the hooks below are registered, so the indexes are dropped before the tiles
+from event.spatial import venue_index
+from .models import County, Stop
+from .spatial import stop_index
+
+MAX_ZOOM = 22
+BUFFER = 64  # tile units (1/16 of a 256px tile) drawn past each edge, so symbols aren't clipped
+
+LAYERS = {
+    "stops": (stop_index, Stop),
+    "venues": (venue_index, Venue),
+}
+
+
+def render_tile(db: Session, key) -> bytes:
+    layer, z, x, y = key
+    index = LAYERS[layer][0].get()
+    clusters = index.clusters
+    if not len(clusters.x):
+        return b""
+
+    if z <= clusters.max_zoom:
+        px, py, count, ref = clusters.levels[z]
+    else:
+        px, py = clusters.x, clusters.y
+        count = np.ones(len(px), dtype=np.int64)
+        ref = np.arange(len(px))
+
+    n = 2 ** z
+    tx = (px * n - x) * EXTENT
+    ty = (py * n - y) * EXTENT
+    inside = np.flatnonzero((tx >= -BUFFER) & (tx < EXTENT + BUFFER) & (ty >= -BUFFER) & (ty < EXTENT + BUFFER))
+    if not len(inside):
+        return b""
+
+    features = []
+    for j in inside:
+        if count[j] == 1:
+            point = index.points[ref[j]]
+            properties = {k: v for k, v in point.items() if k not in ("lat", "lng")}
+            features.append((point["id"], round(tx[j]), round(ty[j]), properties))
+        else:
+            cluster_id = (int(j) << 5) + z
+            properties = {"cluster": True, "cluster_id": cluster_id, "point_count": int(count[j])}
+            features.append((cluster_id, round(tx[j]), round(ty[j]), properties))
+    return encode_tile([encode_layer(layer, features)])
+
+
+tile_cache = SnapshotCache("tiles", render_tile, max_entries=4096)
+
+
+def tiles_around(layer: str, lat: float, lng: float):
+    """(layer, z, x, y) of every tile that can draw a point or cluster from (lat, lng)"""
+    (mx,), (my,) = mercator_xy([lat], [lng])
+    for z in range(MAX_ZOOM + 1):
+        n = 2 ** z
+        # A cluster's centre stays in its grid cell, so within a cell diagonal of its points
+        reach = (CLUSTER_RADIUS_PX * math.sqrt(2) if z <= CLUSTER_MAX_ZOOM else 0) * EXTENT / 256 + BUFFER
+        margin = reach / EXTENT / n
+        for tx in range(max(0, math.floor((mx - margin) * n)), min(n - 1, math.floor((mx + margin) * n)) + 1):
+            for ty in range(max(0, math.floor((my - margin) * n)), min(n - 1, math.floor((my + margin) * n)) + 1):
+                yield (layer, z, tx, ty)
+
+
+# -----------------------------
+# Session hooks: drop the tiles around each committed Stop / Venue write
+# -----------------------------
+@event.listens_for(Session, "after_flush")
+def _note_tile_writes(session, flush_context):
+    points = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, County):
+            session.info["tiles_stale"] = True
+            continue
+        for layer, (_, model) in LAYERS.items():
+            if not isinstance(obj, model):
+                continue
+            state = inspect(obj)
+            # Where it was before this flush, as well as where it is now
+            lats = [obj.lat] + list(state.attrs.lat.history.deleted or [])
+            lngs = [obj.lng] + list(state.attrs.lng.history.deleted or [])
+            for lat in lats:
+                for lng in lngs:
+                    if lat is not None and lng is not None:
+                        points.append((layer, lat, lng))
+    if points:
+        session.info.setdefault("tile_points", []).extend(points)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_tiles(session):
+    points = session.info.pop("tile_points", None)
+    if session.info.pop("tiles_stale", False):
+        tile_cache.clear()
+    elif points:
+        tile_cache.invalidate_many({
+            key
+            for layer, lat, lng in set(points)
+            for key in tiles_around(layer, lat, lng)
+        })
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tile_writes(session):
+    session.info.pop("tile_points", None)
+    session.info.pop("tiles_stale", None)
@@ -5,6 +5,12 @@ from typing import List
 from . import models
 from typing import List, Tuple, Optional
 from .models import RouteTemplate
+from .graph_index import route_graph_index, track_route_nodes_deleted, track_route_nodes_written, track_stop_nodes_deleted
+from .stop_paths import track_route_paths
+from collections import defaultdict
+from sqlalchemy import select, update, delete, func, literal, case, and_, or_, String
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 
 def build_previous_chain(node):
@@ -182,46 +188,30 @@ def find_matching_subsequence(
     stop_nodes_data: list,
     exclude_route_id: int | None = None
 ):
+    """
+    Find where the new route can merge into an existing chain, matched against the
+    in-memory route graph index. Returns (start index, existing StopNode chain) or None.
+    """
     if not stop_nodes_data:
         return None
 
     target_stop_ids = [s.stop_id for s in stop_nodes_data]
     print(f"🔍 Matching against: {target_stop_ids}")
 
-    for start_idx in range(len(target_stop_ids)):
-        subsequence = target_stop_ids[start_idx:]
-
-        # ❌ block single-stop merges ONLY
-        if len(subsequence) < 2:
-            continue
-
-        candidates_q = db.query(StopNode).filter(
-            StopNode.stop_id == subsequence[0]
-        )
-
-        if exclude_route_id:
-            candidates_q = candidates_q.filter(
-                StopNode.route_id != exclude_route_id
-            )
-
-        candidates = candidates_q.all()
-
-        for candidate in candidates:
-
-            # ❌ existing chain must continue
-            if candidate.next_stop_node is None:
-                continue
-
-            if is_matching_chain(candidate, subsequence):
-                chain = build_chain_from_node(candidate, len(subsequence))
-                print(
-                    f"✅ MERGE at stop {candidate.stop_id}, "
-                    f"nodes {[n.id for n in chain]}"
-                )
-                return start_idx, chain
+    route_graph_index.ensure_fresh()
+    match = route_graph_index.find_matching_subsequence(target_stop_ids, exclude_route_id)
+    if not match:
+        print("❌ No merge found")
+        return None
 
-    print("❌ No merge found")
-    return None
+    start_idx, node_ids = match
+    nodes = {n.id: n for n in db.query(StopNode).filter(StopNode.id.in_(node_ids)).all()}
+    chain = [nodes[node_id] for node_id in node_ids]
+    print(
+        f"✅ MERGE at stop {chain[0].stop_id}, "
+        f"nodes {node_ids}"
+    )
+    return start_idx, chain
 
 
 def is_matching_chain(
@@ -284,6 +274,196 @@ def cleanup_node_references(
         db.add(next_node)
 
 
+def delete_route_template(db: Session, route_id: int) -> bool:
+    """
+    Delete a route template and its nodes in a fixed number of statements; False if it
+    doesn't exist. Does not commit.
+
+    Nodes other routes merge into (and everything downstream of them) are kept: they are
+    handed to the lowest-id route that reaches them, so those routes' chains stay whole and
+    no cross-route next_stop_id ends up dangling. The rest of the route's nodes are deleted.
+    """
+    if db.execute(select(RouteTemplate.id).where(RouteTemplate.id == route_id).with_for_update()).first() is None:
+        return False
+
+    node, prev = aliased(StopNode), aliased(StopNode)
+    entries = (
+        select(node.id.label("node_id"), func.min(prev.route_id).label("owner"))
+        .join(prev, and_(prev.next_stop_id == node.id, prev.route_id != route_id))
+        .where(node.route_id == route_id)
+        .group_by(node.id)
+    )
+    kept = entries.cte("kept_nodes", recursive=True)
+    current, following = aliased(StopNode), aliased(StopNode)
+    kept = kept.union(
+        select(following.id, kept.c.owner)
+        .select_from(kept)
+        .join(current, current.id == kept.c.node_id)
+        .join(following, and_(following.id == current.next_stop_id, following.route_id == route_id))
+    )
+    owners = select(kept.c.node_id, func.min(kept.c.owner).label("owner")).group_by(kept.c.node_id).subquery()
+
+    moved = db.execute(
+        update(StopNode)
+        .where(StopNode.id == owners.c.node_id)
+        .values(route_id=owners.c.owner)
+        .returning(StopNode.id, StopNode.next_stop_id, StopNode.stop_id, StopNode.route_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.execute(delete(StopNode).where(StopNode.route_id == route_id).execution_options(synchronize_session=False))
+    # route_group_association rows go with it (ON DELETE CASCADE)
+    db.execute(delete(RouteTemplate).where(RouteTemplate.id == route_id).execution_options(synchronize_session=False))
+
+    # Query-level writes: flush events don't see them
+    track_route_nodes_deleted(db, route_id)
+    track_route_nodes_written(db, moved)
+    return True
+
+
+def lcs_pairs(old: list[int], new: list[int]) -> list[tuple[int, int]]:
+    """Index pairs (i, j) of a longest common subsequence of old and new, in order"""
+    lengths = [[0] * (len(new) + 1) for _ in range(len(old) + 1)]
+    for i in range(len(old) - 1, -1, -1):
+        for j in range(len(new) - 1, -1, -1):
+            lengths[i][j] = lengths[i + 1][j + 1] + 1 if old[i] == new[j] else max(lengths[i + 1][j], lengths[i][j + 1])
+    pairs, i, j = [], 0, 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif lengths[i + 1][j] >= lengths[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def _own_chain(nodes: list[StopNode]) -> list[StopNode]:
+    """A route's own nodes in chain order (heads first, by id; anything unreachable last)"""
+    by_id = {n.id: n for n in nodes}
+    linked = {n.next_stop_id for n in nodes}
+    ordered, seen = [], set()
+    for head in sorted((n for n in nodes if n.id not in linked), key=lambda n: n.id) + sorted(nodes, key=lambda n: n.id):
+        node = head
+        while node is not None and node.id not in seen:
+            seen.add(node.id)
+            ordered.append(node)
+            node = by_id.get(node.next_stop_id)
+    return ordered
+
+
+def _indexed_path(node_id: int | None) -> list[int]:
+    """Stop ids from node_id to the end of its chain, by the route graph index"""
+    stops, seen = [], set()
+    while node_id is not None and node_id not in seen:
+        seen.add(node_id)
+        stops.append(route_graph_index.stop_of.get(node_id))
+        node_id = route_graph_index.next_of.get(node_id)
+    return stops
+
+
+def _merge_target(db: Session, route_id: int, old: list[StopNode], stop_nodes: list) -> tuple[int, int | None]:
+    """(number of own nodes, node id the last one links to) for the new stop sequence"""
+    stop_ids = [s.stop_id for s in stop_nodes]
+    match_info = find_matching_subsequence(db, stop_nodes, exclude_route_id=route_id)
+    own_count, merge_id = len(stop_ids), None
+    if match_info:
+        own_count, chain = match_info
+        # Ensure the route keeps at least one node of its own as an entry point
+        if own_count == 0 and len(chain) > 1:
+            own_count, chain = 1, chain[1:]
+        merge_id = chain[0].id
+
+    # Keep the chain the route already merges into if it still matches as far
+    tail_id = old[-1].next_stop_id if old else None
+    if tail_id is not None and route_graph_index.route_of.get(tail_id) != route_id:
+        tail = _indexed_path(tail_id)
+        tail_count = len(stop_ids) - len(tail)
+        if len(tail) > 1 and 0 < tail_count <= own_count and tail == stop_ids[tail_count:]:
+            return tail_count, tail_id
+    return own_count, merge_id
+
+
+def update_route_nodes(db: Session, route: RouteTemplate, stop_nodes: list) -> dict:
+    """
+    Bring a route's own StopNodes in line with stop_nodes (the full stop sequence) with the
+    fewest writes: nodes are matched to the existing chain by an LCS on stop_id, so kept
+    nodes keep their ids; only changed prices, new nodes, changed next_stop_id links and
+    dropped nodes are written. Does not commit.
+
+    The merge into another route's chain is chosen as route creation does; the current one
+    is kept while it still matches. Other routes that run into this one keep their paths:
+    where the edit would change the path from a node they enter, that node and the ones
+    after it are handed to the lowest-id such route, as delete_route_template does.
+    """
+    old = _own_chain(db.query(StopNode).filter(StopNode.route_id == route.id).all())
+    by_id = {n.id: n for n in old}
+    stop_ids = [s.stop_id for s in stop_nodes]
+    own_count, merge_id = _merge_target(db, route.id, old, stop_nodes)
+    wanted = stop_nodes[:own_count]
+
+    pairs = lcs_pairs([n.stop_id for n in old], stop_ids[:own_count])
+    new_index_of = {old[i].id: j for i, j in pairs}
+
+    entries = dict(
+        db.query(StopNode.next_stop_id, func.min(StopNode.route_id))
+        .filter(StopNode.next_stop_id.in_(by_id), StopNode.route_id != route.id)
+        .group_by(StopNode.next_stop_id)
+        .all()
+    ) if old else {}
+    handed = {}
+    for node_id, owner in entries.items():
+        node = by_id[node_id]
+        while node is not None:
+            j = new_index_of.get(node.id)
+            # Unchanged from here on, and not the new head (a head has nothing linking to it)
+            if j and stop_ids[j:] == _indexed_path(node.id):
+                break
+            handed[node.id] = min(owner, handed.get(node.id, owner))
+            node = by_id.get(node.next_stop_id)
+    for node_id, owner in handed.items():
+        new_index_of.pop(node_id, None)
+        by_id[node_id].route_id = owner
+
+    kept_at = {j: by_id[node_id] for node_id, j in new_index_of.items()}
+    chain = []
+    for j, stop in enumerate(wanted):
+        node = kept_at.get(j)
+        if node is None:
+            node = StopNode(route_id=route.id, stop_id=stop.stop_id, price=stop.price)
+            db.add(node)
+        elif node.price != stop.price:
+            node.price = stop.price
+        chain.append(node)
+    inserted = len(wanted) - len(kept_at)
+    if inserted:
+        db.flush()  # ids for the new nodes, in one batch
+
+    relinked = 0
+    for node, following in zip(chain, chain[1:] + [None]):
+        next_id = following.id if following is not None else merge_id
+        if node.next_stop_id != next_id:
+            node.next_stop_id = next_id
+            relinked += 1
+    db.flush()
+
+    # Nothing links to the rest any more: other routes only reach kept or handed-over nodes
+    removed = [n.id for n in old if n.id not in new_index_of and n.id not in handed]
+    if removed:
+        # Query-level, so the ORM doesn't null links it has loaded
+        db.execute(delete(StopNode).where(StopNode.id.in_(removed)))
+        track_stop_nodes_deleted(db, removed)
+    if removed or handed:
+        # Nodes leaving the route may be its only change: flag it for the path refresh
+        track_route_paths(db, StopNode, [route.id])
+
+    return {
+        "kept": len(kept_at), "inserted": inserted, "relinked": relinked,
+        "handed_over": len(handed), "removed": len(removed),
+    }
+
+
 def build_route_with_full_stops(route: RouteTemplate):
     all_nodes: list[StopNode] = []
     visited = set()
@@ -318,4 +498,77 @@ def attach_full_stop_nodes(route: RouteTemplate):
     unique_nodes = {node.id: node for node in all_nodes}.values()
     route.stop_nodes = list(unique_nodes)
 
-    return route
\ No newline at end of file
+    return route
+
+def load_stop_node_graph(db: Session, node_model, route_ids: list[int]) -> list:
+    """
+    Load every node the given routes' chains touch with one WITH RECURSIVE query: the routes'
+    own nodes, everything downstream via next_stop_id (merged into other routes) and every
+    upstream predecessor of those, joined with their Stop and County.
+
+    next_stop_node / previous_stop_node are filled in from the loaded set, so walking the
+    chains afterwards issues no further queries. Works for StopNode and EventStopNode.
+    """
+    if not route_ids:
+        return []
+
+    seed = select(
+        node_model.id,
+        node_model.next_stop_id,
+        literal("f", String).label("direction")
+    ).where(node_model.route_id.in_(route_ids))
+    graph = seed.cte("node_graph", recursive=True)
+
+    # Forward edges only from forward nodes; backward edges (predecessors) from every node.
+    node = aliased(node_model)
+    forward = and_(graph.c.direction == "f", node.id == graph.c.next_stop_id)
+    graph = graph.union(
+        select(
+            node.id,
+            node.next_stop_id,
+            case((forward, literal("f", String)), else_=literal("b", String))
+        ).where(or_(forward, node.next_stop_id == graph.c.id))
+    )
+
+    nodes = db.execute(
+        select(node_model)
+        .where(node_model.id.in_(select(graph.c.id)))
+        .options(joinedload(node_model.stop).joinedload(models.Stop.county))
+        .order_by(node_model.id)
+    ).unique().scalars().all()
+
+    by_id = {n.id: n for n in nodes}
+    previous = defaultdict(list)
+    for n in nodes:
+        if n.next_stop_id is not None:
+            previous[n.next_stop_id].append(n)
+    for n in nodes:
+        set_committed_value(n, "next_stop_node", by_id.get(n.next_stop_id))
+        set_committed_value(n, "previous_stop_node", previous[n.id])
+
+    return nodes
+
+
+def load_full_stop_nodes(db: Session, routes: list[RouteTemplate]) -> list[RouteTemplate]:
+    """
+    Same result as attach_full_stop_nodes for each route, with the whole node graph
+    fetched in one query instead of one lazy load per hop.
+    """
+    nodes = load_stop_node_graph(db, StopNode, [route.id for route in routes])
+
+    own_nodes = defaultdict(list)
+    for node in nodes:
+        own_nodes[node.route_id].append(node)
+
+    for route in routes:
+        all_nodes = []
+        visited = set()
+        for node in own_nodes[route.id]:
+            if not node.previous_stop_node:  # starting nodes
+                all_nodes.extend(build_full_route_from_node(node, visited))
+
+        # Deduplicate nodes (branches safe); committed so nothing is flushed back
+        unique_nodes = {node.id: node for node in all_nodes}.values()
+        set_committed_value(route, "stop_nodes", list(unique_nodes))
+
+    return routes
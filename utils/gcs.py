@@ -1,14 +1,56 @@
 import os
 import json
-from google.cloud import storage
+import threading
 from uuid import uuid4
 from fastapi import UploadFile
 from core.app.env import settings
 
 class GCSStorage:
+    """
+    The storage client is created on first use (not at import), once per process,
+    behind a lock; it is thread-safe and shared by all requests.
+    """
     def __init__(self, bucket_name: str = None, credentials_path: str = "service_account.json"):
         self.bucket_name = bucket_name or settings.GCS_BUCKET_NAME
-        
+        self.credentials_path = credentials_path
+        self._client = None
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            client = self.client
+            with self._lock:
+                if self._bucket is None:
+                    self._bucket = client.bucket(self.bucket_name)
+        return self._bucket
+
+    def warm_up(self, background: bool = True):
+        """Build the client ahead of the first upload, by default in a background thread"""
+        def build():
+            try:
+                self.bucket
+            except Exception as e:
+                print(f"❌ GCS warm-up failed: {e}")
+
+        if not background:
+            build()
+            return
+        threading.Thread(target=build, name="gcs-warm-up", daemon=True).start()
+
+    def _create_client(self):
+        # Imported here: google.cloud.storage is slow to import and most workers rarely need it
+        from google.cloud import storage
+
         # Check if individual credentials are provided in env
         if settings.GCS_TYPE and settings.GCS_PRIVATE_KEY:
             try:
@@ -28,30 +70,31 @@ class GCSStorage:
                 # Remove None values
                 credentials_info = {k: v for k, v in credentials_info.items() if v is not None}
                 
-                self.client = storage.Client.from_service_account_info(credentials_info)
+                client = storage.Client.from_service_account_info(credentials_info)
                 print("✅ GCS storage initialized using individual environment variables")
+                return client
             except Exception as e:
                 print(f"❌ Failed to initialize GCS from individual env vars: {e}")
-                self._init_from_file(credentials_path)
-        else:
-            self._init_from_file(credentials_path)
 
-        self.bucket = self.client.bucket(self.bucket_name)
+        return self._init_from_file(self.credentials_path)
 
     def _init_from_file(self, credentials_path: str):
+        from google.cloud import storage
+
         config_path = os.path.join(os.getcwd(), credentials_path)
         if not os.path.exists(config_path):
              # Fallback if running from a different directory (sanity check)
              config_path = credentials_path
         
         if os.path.exists(config_path):
-            self.client = storage.Client.from_service_account_json(config_path)
+            client = storage.Client.from_service_account_json(config_path)
             print(f"✅ GCS storage initialized using service account file: {config_path}")
         else:
             # If no file and no env, this will likely fail later but we try to initialize with default auth
             # Or we can raise an error. GCS Client usually looks for GOOGLE_APPLICATION_CREDENTIALS env var.
-            self.client = storage.Client()
+            client = storage.Client()
             print("ℹ️ GCS storage initialized using default credentials")
+        return client
 
     async def upload_file(self, file: UploadFile, directory: str = "events") -> str:
         """
@@ -108,5 +151,5 @@ class GCSStorage:
             
         return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
 
-# Singleton instance (optional, or instantiate where needed)
+# Singleton instance; cheap to create, the client is built on first use
 gcs_storage = GCSStorage()
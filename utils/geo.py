@@ -0,0 +1,241 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+CLUSTER_MAX_ZOOM = 16
+CLUSTER_RADIUS_PX = 60
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) from one point to arrays of points"""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_legs(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) between consecutive points (n - 1 legs)"""
+    lat, lng = np.radians(lats), np.radians(lngs)
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PointGrid:
+    """
+    Uniform lat/lng grid over a fixed set of points, for k-nearest queries.
+
+    Points are bucketed by cell; a query gathers the cells around the target, ring by ring,
+    until the k-th nearest candidate is closer than anything an outer ring could hold, then
+    ranks the candidates with vectorized haversine.
+    """
+    def __init__(self, ids, lats, lngs, cell_deg: float = 0.05):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.cells: dict[tuple[int, int], np.ndarray] = {}
+
+        if len(self.ids):
+            rows = np.floor(self.lats / cell_deg).astype(np.int64)
+            cols = np.floor(self.lngs / cell_deg).astype(np.int64)
+            order = np.lexsort((cols, rows))
+            keys = np.stack([rows[order], cols[order]], axis=1)
+            starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+            for chunk in np.split(order, starts):
+                self.cells[(int(rows[chunk[0]]), int(cols[chunk[0]]))] = chunk
+            self.row_span = (int(rows.min()), int(rows.max()))
+            self.col_span = (int(cols.min()), int(cols.max()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _ring(self, row: int, col: int, r: int) -> list[np.ndarray]:
+        """Point indexes in the cells r steps around (row, col), clipped to the occupied span"""
+        if r == 0:
+            cell = self.cells.get((row, col))
+            return [cell] if cell is not None else []
+        row_lo, row_hi = max(row - r, self.row_span[0]), min(row + r, self.row_span[1])
+        col_lo, col_hi = max(col - r, self.col_span[0]), min(col + r, self.col_span[1])
+        found = []
+        for rr in (row - r, row + r):
+            if row_lo <= rr <= row_hi:
+                for c in range(col_lo, col_hi + 1):
+                    cell = self.cells.get((rr, c))
+                    if cell is not None:
+                        found.append(cell)
+        for c in (col - r, col + r):
+            if col_lo <= c <= col_hi:
+                for rr in range(max(row - r + 1, row_lo), min(row + r - 1, row_hi) + 1):
+                    cell = self.cells.get((rr, c))
+                    if cell is not None:
+                        found.append(cell)
+        return found
+
+    def _covered_km(self, lat: float, r: int) -> float:
+        """Lower bound on the distance from a point in the centre cell to anything beyond ring r"""
+        # Cells are narrowest east-west, at the pole-ward edge of the band searched; the
+        # margin allows for great circles running slightly shorter than parallels
+        edge = min(abs(lat) + (r + 1) * self.cell_deg, 89.9)
+        return 0.95 * r * self.cell_deg * KM_PER_DEGREE_LAT * math.cos(math.radians(edge))
+
+    def nearest(self, lat: float, lng: float, k: int = 5, radius_km: float | None = None) -> list[tuple[int, float]]:
+        """Up to k (id, distance_km) pairs, closest first, optionally within radius_km"""
+        if not len(self.ids) or k <= 0:
+            return []
+
+        row = math.floor(lat / self.cell_deg)
+        col = math.floor(lng / self.cell_deg)
+        last_ring = max(
+            abs(row - self.row_span[0]), abs(row - self.row_span[1]),
+            abs(col - self.col_span[0]), abs(col - self.col_span[1]),
+        )
+
+        # Rings nearer than the grid's bounding box are empty
+        first_ring = max(0, self.row_span[0] - row, row - self.row_span[1], self.col_span[0] - col, col - self.col_span[1])
+
+        chunks, dists = [], []
+        best = np.empty(0)  # k smallest distances so far
+        pending = []        # cells gathered but not measured yet
+        probed = 0
+        for r in range(first_ring, last_ring + 1):
+            probed += max(8 * r, 1)
+            if probed * 32 > len(self.ids):
+                # A cell probe costs about as much as ranking 32 points: past this, rank them all
+                chunks = [np.arange(len(self.ids))]
+                dists = [haversine_km(lat, lng, self.lats, self.lngs)]
+                pending = []
+                break
+            pending.extend(self._ring(row, col, r))
+
+            covered = self._covered_km(lat, r)
+            if radius_km is not None and radius_km <= covered:
+                break
+            if pending and len(best) + sum(len(c) for c in pending) >= k:
+                found = np.concatenate(pending)
+                found_dist = haversine_km(lat, lng, self.lats[found], self.lngs[found])
+                chunks.append(found)
+                dists.append(found_dist)
+                pending = []
+                best = np.concatenate([best, found_dist])
+                if len(best) > k:
+                    best = np.partition(best, k - 1)[:k]
+            if len(best) >= k and best.max() <= covered:
+                break
+
+        if pending:
+            found = np.concatenate(pending)
+            chunks.append(found)
+            dists.append(haversine_km(lat, lng, self.lats[found], self.lngs[found]))
+        if not chunks:
+            return []
+        candidates = np.concatenate(chunks)
+        dist = np.concatenate(dists)
+        if radius_km is not None:
+            keep = dist <= radius_km
+            candidates, dist = candidates[keep], dist[keep]
+        top = np.argsort(dist, kind="stable")[:k] if len(dist) <= 4 * k else np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top], kind="stable")]
+        return [(int(self.ids[candidates[i]]), float(dist[i])) for i in top]
+
+
+def parse_bbox(value: str) -> tuple[float, float, float, float]:
+    """'min_lng,min_lat,max_lng,max_lat' -> floats; ValueError if malformed"""
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox needs 4 numbers: min_lng,min_lat,max_lng,max_lat")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox out of range or min > max")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def mercator_xy(lats, lngs) -> tuple[np.ndarray, np.ndarray]:
+    """Web Mercator coordinates normalised to [0, 1] (x east, y south)"""
+    x = (np.asarray(lngs, dtype=np.float64) + 180.0) / 360.0
+    sin = np.clip(np.sin(np.radians(np.asarray(lats, dtype=np.float64))), -0.9999, 0.9999)
+    y = 0.5 - 0.25 * np.log((1 + sin) / (1 - sin)) / math.pi
+    return np.clip(x, 0.0, 1.0), np.clip(y, 0.0, 1.0)
+
+
+def mercator_lat_lng(x, y) -> tuple[np.ndarray, np.ndarray]:
+    lng = np.asarray(x) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * np.asarray(y)))))
+    return lat, lng
+
+
+class ClusterIndex:
+    """
+    Map clusters precomputed for every zoom level 0..max_zoom (supercluster-style).
+
+    At zoom z the world is 256 * 2^z pixels wide; points are binned into cells of
+    radius_px pixels and each cell becomes one cluster at the mean position of its points
+    (or stays a single point). Above max_zoom every point is returned as is. A viewport query
+    only returns what falls in its bbox, so the payload follows the viewport, not the catalog.
+    """
+    def __init__(self, lats, lngs, max_zoom: int = CLUSTER_MAX_ZOOM, radius_px: int = CLUSTER_RADIUS_PX):
+        self.max_zoom = max_zoom
+        self.radius_px = radius_px
+        self.x, self.y = mercator_xy(lats, lngs)
+        self.levels = []  # per zoom: (x, y, count, first point index)
+        if not len(self.x):
+            return
+        for zoom in range(max_zoom + 1):
+            cells = 2 ** zoom * 256 / radius_px
+            cx = np.floor(self.x * cells).astype(np.int64)
+            cy = np.floor(self.y * cells).astype(np.int64)
+            keys, inverse, counts = np.unique(cx * (int(cells) + 1) + cy, return_inverse=True, return_counts=True)
+            first = np.empty(len(keys), dtype=np.int64)
+            first[inverse[::-1]] = np.arange(len(self.x))[::-1]
+            self.levels.append((
+                np.bincount(inverse, weights=self.x) / counts,
+                np.bincount(inverse, weights=self.y) / counts,
+                counts,
+                first,
+            ))
+
+    def query(self, bbox: tuple[float, float, float, float], zoom: int) -> list[tuple]:
+        """
+        (lat, lng, point_count, point index or cluster id) in bbox (min_lng, min_lat,
+        max_lng, max_lat) at zoom; point_count 1 means a single point.
+        """
+        if not len(self.x):
+            return []
+        min_lng, min_lat, max_lng, max_lat = bbox
+        (x0, x1), (y1, y0) = mercator_xy([min_lat, max_lat], [min_lng, max_lng])
+
+        if zoom > self.max_zoom:
+            x, y = self.x, self.y
+            count = np.ones(len(x), dtype=np.int64)
+            ref = np.arange(len(x))
+        else:
+            x, y, count, ref = self.levels[zoom]
+        inside = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        lat, lng = mercator_lat_lng(x[inside], y[inside])
+        return [
+            (
+                float(lat[i]), float(lng[i]), int(count[j]),
+                # Cluster ids encode the zoom level and the cluster's index within it
+                int(ref[j]) if count[j] == 1 else (int(j) << 5) + zoom,
+            )
+            for i, j in enumerate(inside)
+        ]
+
+
+def cluster_features(clusters: ClusterIndex, points: list[dict], bbox, zoom: int) -> list[dict]:
+    """GeoJSON features for a viewport: cluster features plus the points (dicts with lat/lng) left unclustered"""
+    features = []
+    for lat, lng, count, ref in clusters.query(bbox, zoom):
+        if count == 1:
+            point = points[ref]
+            lat, lng = point["lat"], point["lng"]
+            properties = {k: v for k, v in point.items() if k not in ("lat", "lng")}
+        else:
+            properties = {"cluster": True, "cluster_id": ref, "point_count": count}
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lng, lat]},
+            "properties": properties,
+        })
+    return features
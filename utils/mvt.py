@@ -0,0 +1,111 @@
+"""
+Minimal Mapbox Vector Tile (spec v2.1) encoder for point layers.
+
+Only what the tile endpoint needs: POINT features with scalar properties, written straight
+to protobuf wire format, so no protobuf / mapbox-vector-tile dependency is required.
+"""
+import math
+import struct
+
+EXTENT = 4096
+
+# wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH = 2
+
+_MOVE_TO = 1
+_POINT = 1
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    value &= 0xFFFFFFFFFFFFFFFF
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, _LENGTH) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values) -> bytes:
+    return _length_delimited(field, b"".join(_varint(v) for v in values))
+
+
+def _value(value) -> bytes:
+    """Layer.Value message for a scalar property"""
+    if isinstance(value, bool):
+        return _key(7, _VARINT) + _varint(int(value))
+    if isinstance(value, int):
+        if value < 0:
+            return _key(6, _VARINT) + _varint(_zigzag(value))
+        return _key(5, _VARINT) + _varint(value)
+    if isinstance(value, float):
+        return _key(3, _FIXED64) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode())
+
+
+def encode_layer(name: str, features, extent: int = EXTENT) -> bytes:
+    """
+    One Tile.Layer. features: iterable of (id, x, y, properties) with x / y in tile
+    coordinates (0..extent, may fall slightly outside for the buffer).
+    """
+    keys: dict[str, int] = {}
+    values: dict[tuple, int] = {}
+    encoded = []
+
+    for feature_id, x, y, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in keys:
+                keys[key] = len(keys)
+            # type is part of the key so 1 and True (equal in Python) stay distinct values
+            value_key = (type(value), value)
+            if value_key not in values:
+                values[value_key] = len(values)
+            tags += [keys[key], values[value_key]]
+
+        body = b""
+        if feature_id is not None:
+            body += _key(1, _VARINT) + _varint(feature_id)
+        if tags:
+            body += _packed(2, tags)
+        body += _key(3, _VARINT) + _varint(_POINT)
+        body += _packed(4, [(_MOVE_TO & 0x7) | (1 << 3), _zigzag(int(x)), _zigzag(int(y))])
+        encoded.append(_length_delimited(2, body))
+
+    layer = _key(15, _VARINT) + _varint(2) + _length_delimited(1, name.encode())
+    layer += b"".join(encoded)
+    layer += b"".join(_length_delimited(3, key.encode()) for key in keys)
+    layer += b"".join(_length_delimited(4, _value(value)) for _, value in values)
+    layer += _key(5, _VARINT) + _varint(extent)
+    return layer
+
+
+def encode_tile(layers: list[bytes]) -> bytes:
+    """Tile message from encoded layers (empty layers are left out)"""
+    return b"".join(_length_delimited(3, layer) for layer in layers if layer)
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Tile (z, x, y) as (west, south, east, north) degrees"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)